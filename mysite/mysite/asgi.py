@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Requests run their queries in threads of their own under ASGI, so persistent
+# connections pile up, one per thread, instead of being reused. Close them.
+os.environ.setdefault('POLLS_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
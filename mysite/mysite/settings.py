@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.metrics.QueryMetricsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -50,9 +52,6 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "debug_toolbar.middleware.DebugToolbarMiddleware",
-    "django.middleware.cache.UpdateCacheMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.cache.FetchFromCacheMiddleware"
 ]
 
 ROOT_URLCONF = 'mysite.urls'
@@ -81,7 +80,59 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('POLLS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        # Seconds a connection is reused across requests, checked before reuse.
+        # Under ASGI, asgi.py defaults it to 0.
+        'CONN_MAX_AGE': int(os.environ.get('POLLS_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Read replicas of the default database, as comma separated POLLS_REPLICA_DB_NAMES.
+# Results, statistics, index and export reads of polls go to a random replica,
+# except for clients that voted less than POLLS_REPLICA_LAG seconds ago.
+POLLS_READ_REPLICAS = []
+for name in filter(None, os.environ.get('POLLS_REPLICA_DB_NAMES', '').split(',')):
+    alias = f'replica{len(POLLS_READ_REPLICAS) + 1}'
+    # Tests run against the default database only.
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    POLLS_READ_REPLICAS.append(alias)
+POLLS_REPLICA_LAG = int(os.environ.get('POLLS_REPLICA_LAG', 5))
+DATABASE_ROUTERS = ['polls.routers.ReplicaRouter']
+
+# SQLite connections are opened in WAL mode, so reads don't wait for writes, and
+# wait up to this many milliseconds for a locked database instead of failing.
+POLLS_SQLITE_WAL = os.environ.get('POLLS_SQLITE_WAL', '1') == '1'
+POLLS_SQLITE_BUSY_TIMEOUT = int(os.environ.get('POLLS_SQLITE_BUSY_TIMEOUT', 5000))
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# POLLS_CACHE selects the backend. LocMem is private to each worker process, so
+# with several workers use "file" (POLLS_CACHE_LOCATION is a directory) or "redis"
+# (POLLS_CACHE_LOCATION is a redis:// url, needs the redis package).
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_LOCATIONS = {
+    'locmem': 'polls',
+    'file': BASE_DIR / 'cache',
+    'redis': 'redis://127.0.0.1:6379',
+}
+POLLS_CACHE = os.environ.get('POLLS_CACHE', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[POLLS_CACHE],
+        'LOCATION': os.environ.get('POLLS_CACHE_LOCATION', CACHE_LOCATIONS[POLLS_CACHE]),
+        'OPTIONS': {'MAX_ENTRIES': 10000} if POLLS_CACHE != 'redis' else {},
     }
 }
 
@@ -131,3 +182,37 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 INTERNAL_IPS = ["127.0.0.1"]
 
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
+# Number of counter rows each choice's votes are spread across.
+POLLS_VOTE_COUNTER_SHARDS = 8
+
+# Minimum seconds between two result updates streamed to a viewer, and seconds of
+# silence after which a keepalive comment is sent.
+POLLS_STREAM_INTERVAL = 1.0
+POLLS_STREAM_KEEPALIVE = 15
+
+# Background writer of the async vote API: max queued ballots before votes are
+# rejected, answers saved per batch, and max milliseconds a ballot waits in a batch.
+POLLS_WRITER_QUEUE_SIZE = 10000
+POLLS_WRITER_BATCH_SIZE = 500
+POLLS_WRITER_FLUSH_MS = 50
+
+# Polls per page of the index and the poll list API.
+POLLS_INDEX_PAGE_SIZE = 20
+
+# Seconds a vote submission response is kept for replays of its Idempotency-Key.
+POLLS_IDEMPOTENCY_TTL = 60 * 60 * 24
+
+# Rate limiting of the vote views per client: limiter class (None turns limiting
+# off), tokens refilled per second and max tokens of a client.
+POLLS_VOTE_LIMITER = 'polls.limits.TokenBucketLimiter'
+POLLS_VOTE_RATE = 1.0
+POLLS_VOTE_BURST = 10
+
+# Function returning the rate limit key of a request, by default its session or
+# address, and the header a trusted reverse proxy puts the client address in.
+POLLS_VOTE_LIMIT_KEY = 'polls.limits.client_key'
+POLLS_TRUSTED_PROXY_HEADER = os.environ.get('POLLS_TRUSTED_PROXY_HEADER')
+
+# Rejecting further votes in a poll from a session that already voted in it.
+POLLS_ONE_VOTE_PER_SESSION = True
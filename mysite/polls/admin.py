@@ -1,10 +1,15 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+
+from .counters import annotate_poll_totals, annotate_vote_totals
 from .models import Choice, Question, Poll, Answer
+from .pagination import EstimatedCountPaginator
+from .voting import reset_answers
 
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
     extra = 3
+    fields = ["choice_text"]
 
 
 class QuestionInline(admin.TabularInline):
@@ -12,43 +17,84 @@ class QuestionInline(admin.TabularInline):
     extra = 5
 
 
-class AnswerInline(admin.TabularInline):
-    model = Answer
-    extra = 3
-
-
 class QuestionAdmin(admin.ModelAdmin):
     fieldsets = [
-        (None, {"fields": ["question_text"]}),
+        (None, {"fields": ["poll", "question_text"]}),
         ("Date information", {"fields": ["pub_date"], "classes": ["collapse"]}),
     ]
     inlines = [ChoiceInline]
-    list_display = ["question_text", "pub_date", "was_published_recently"]
+    list_display = ["question_text", "poll", "pub_date", "was_published_recently"]
     list_filter = ["pub_date"]
+    list_select_related = ["poll"]
     search_fields = ["question_text"]
+    autocomplete_fields = ["poll"]
 
 
 admin.site.register(Question, QuestionAdmin)
 
 
+# Answers are only listed, paginated by estimate so the table is never counted.
 class AnswerAdmin(admin.ModelAdmin):
-    list_display = ["choice"]
+    list_display = ["id", "choice", "created_at"]
+    list_select_related = ["choice"]
+    raw_id_fields = ["choice", "ballot"]
+    ordering = ["-id"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Answer, AnswerAdmin)
 
 
 class PollAdmin(admin.ModelAdmin):
-    list_display = ["poll_name", "created_at"]
+    list_display = ["poll_name", "created_at", "question_count", "answer_count"]
     inlines = [QuestionInline]
+    search_fields = ["poll_name"]
+    actions = ["reset_poll_answers"]
+
+    def get_queryset(self, request):
+        return annotate_poll_totals(super().get_queryset(request))
+
+    @admin.display(ordering="question_count")
+    def question_count(self, poll):
+        return poll.question_count
+
+    @admin.display(ordering="answer_count")
+    def answer_count(self, poll):
+        return poll.answer_count
+
+    @admin.action(description="Reset answers of selected polls")
+    def reset_poll_answers(self, request, queryset):
+        poll_ids = list(queryset.values_list("id", flat=True))
+        deleted = reset_answers(poll_ids)
+        self.message_user(
+            request,
+            f"Deleted {deleted} answers of {len(poll_ids)} polls.",
+            messages.SUCCESS,
+        )
 
 
 admin.site.register(Poll, PollAdmin)
 
 
+# Answers of a choice are counted, not loaded into an inline.
 class ChoiceAdmin(admin.ModelAdmin):
-    list_display = ["choice_text", "question"]
-    inlines = [AnswerInline]
+    list_display = ["choice_text", "question", "answer_count"]
+    list_select_related = ["question"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_fields = ["choice_text"]
+    autocomplete_fields = ["question"]
+    readonly_fields = ["answer_count"]
+    fields = ["question", "choice_text", "answer_count"]
+
+    def get_queryset(self, request):
+        return annotate_vote_totals(super().get_queryset(request))
+
+    # Choices being added have no answers and no annotation yet.
+    @admin.display(ordering="total_votes")
+    def answer_count(self, choice):
+        return getattr(choice, "total_votes", 0)
 
 
 admin.site.register(Choice, ChoiceAdmin)
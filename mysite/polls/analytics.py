@@ -0,0 +1,153 @@
+import itertools
+
+import numpy as np
+from django.db import connections
+from django.db.models import BigIntegerField, ExpressionWrapper, F
+
+from polls.models import Answer, ArchivedAnswer
+from polls.structure import get_poll_structure
+
+# Ballots per one hot block multiplied at once, bounding memory to
+# CHUNK_SIZE x choices float32 values. Counts stay exact in float32 per block.
+CHUNK_SIZE = 16384
+# Answers are read as one ballot_id << 32 | choice_id column, fetching rows from
+# the database costs far more than the columns in them.
+CHOICE_BITS = 32
+
+
+# Choices of every ballot of a poll as a (ballots, questions) matrix of choice
+# indexes into "choice_ids", -1 for unanswered questions. Rows are read straight
+# from a database cursor into an array, without a model or tuple per answer.
+class BallotMatrix:
+    def __init__(self, structure):
+        self.structure = structure
+        self.question_ids = [question.id for question in structure.questions]
+        self.choice_ids = np.array(
+            [
+                choice.id
+                for question in structure.questions
+                for choice in question.choices
+            ],
+            dtype=np.int64,
+        )
+        self.choice_counts = [len(question.choices) for question in structure.questions]
+        # Offset of each question's first choice in choice_ids.
+        self.offsets = np.cumsum([0] + self.choice_counts[:-1])
+        self.order = np.argsort(self.choice_ids)
+        self.question_of_choice = np.repeat(
+            np.arange(len(self.question_ids)), self.choice_counts
+        )
+        self.load()
+
+    def load(self):
+        packed = ExpressionWrapper(
+            F("ballot_id") * 2**CHOICE_BITS + F("choice_id"),
+            output_field=BigIntegerField(),
+        )
+        answers = np.concatenate(
+            [
+                self._fetch(
+                    model.objects.filter(ballot__poll_id=self.structure.id).values_list(
+                        packed
+                    )
+                )
+                for model in (Answer, ArchivedAnswer)
+            ]
+        )
+        ballot_column = answers >> CHOICE_BITS
+        choice_column = answers & (2**CHOICE_BITS - 1)
+
+        # Answers of choices added since the poll structure was cached are left out.
+        positions = np.searchsorted(self.choice_ids, choice_column, sorter=self.order)
+        positions = np.minimum(positions, len(self.choice_ids) - 1)
+        choices = self.order[positions]
+        known = self.choice_ids[choices] == choice_column
+        choices = choices[known]
+
+        ballot_ids, ballots = np.unique(ballot_column[known], return_inverse=True)
+        self.choices = np.full(
+            (len(ballot_ids), len(self.question_ids)), -1, dtype=np.int32
+        )
+        self.choices[ballots, self.question_of_choice[choices]] = choices
+
+    # Integer column of a values_list queryset, read on the database it routes to.
+    def _fetch(self, queryset):
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return np.fromiter(itertools.chain.from_iterable(cursor), dtype=np.int64)
+
+    # How often every two choices were picked on one ballot, a (choices, choices)
+    # matrix holding the cross-tabulation of every pair of questions, computed as
+    # the product of one hot encoded ballots with themselves.
+    def cooccurrences(self):
+        total = np.zeros((len(self.choice_ids), len(self.choice_ids)), dtype=np.int64)
+        for start in range(0, len(self.choices), CHUNK_SIZE):
+            chunk = self.choices[start : start + CHUNK_SIZE]
+            rows, columns = np.nonzero(chunk >= 0)
+            one_hot = np.zeros((len(chunk), len(self.choice_ids)), dtype=np.float32)
+            one_hot[rows, chunk[rows, columns]] = 1
+            total += (one_hot.T @ one_hot).astype(np.int64)
+        return total
+
+    def crosstab(self, counts, first, second):
+        rows = slice(
+            self.offsets[first], self.offsets[first] + self.choice_counts[first]
+        )
+        columns = slice(
+            self.offsets[second], self.offsets[second] + self.choice_counts[second]
+        )
+        return counts[rows, columns]
+
+
+# Association of two questions from their cross-tabulation as Cramér's V, 0 for
+# independent answers up to 1 when one answer determines the other.
+def cramers_v(table):
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    total = table.sum()
+    if total == 0 or min(table.shape) < 2:
+        return 0.0
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / total
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    return float(np.sqrt(chi2 / (total * (min(table.shape) - 1))))
+
+
+# Number of ballots, Cramér's V of every pair of questions and, when two question
+# ids are given, their cross-tabulation. None for a missing poll, ValueError for
+# questions not in the poll.
+def poll_analytics(poll_id, question_id=None, by_question_id=None):
+    structure = get_poll_structure(poll_id)
+    if structure is None:
+        return None
+    matrix = BallotMatrix(structure)
+    counts = matrix.cooccurrences()
+
+    questions = range(len(matrix.question_ids))
+    correlations = [
+        [
+            (
+                1.0
+                if first == second
+                else cramers_v(matrix.crosstab(counts, first, second))
+            )
+            for second in questions
+        ]
+        for first in questions
+    ]
+    data = {
+        "poll": structure.id,
+        "ballots": len(matrix.choices),
+        "questions": matrix.question_ids,
+        "correlations": correlations,
+    }
+    if question_id is not None and by_question_id is not None:
+        first = matrix.question_ids.index(question_id)
+        second = matrix.question_ids.index(by_question_id)
+        data["crosstab"] = {
+            "question": question_id,
+            "by": by_question_id,
+            "rows": [choice.id for choice in structure.questions[first].choices],
+            "columns": [choice.id for choice in structure.questions[second].choices],
+            "counts": matrix.crosstab(counts, first, second).tolist(),
+        }
+    return data
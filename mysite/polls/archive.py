@@ -0,0 +1,46 @@
+from django.db import transaction
+
+from polls.models import Answer, ArchivedAnswer, Choice, RollupWatermark
+from polls.rollups import WATERMARK
+from polls.voting import delete_rows
+
+
+# Moving answers of given polls into ArchivedAnswer, batch_size answers per
+# transaction, returns the number of moved answers. Only answers already folded
+# into the rollups are moved, so time series stay complete. Vote counters already
+# hold every answer, so rows are removed without the Answer signals that would
+# uncount them and results don't change.
+def archive_answers(poll_ids, batch_size=10000):
+    last_rolled_up = (
+        RollupWatermark.objects.filter(name=WATERMARK)
+        .values_list("last_answer_id", flat=True)
+        .first()
+    ) or 0
+    choice_ids = list(
+        Choice.objects.filter(question__poll_id__in=poll_ids).values_list(
+            "id", flat=True
+        )
+    )
+    answers = Answer.objects.filter(choice_id__in=choice_ids, id__lte=last_rolled_up)
+
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                answers.order_by("id").values_list(
+                    "id", "choice_id", "ballot_id", "created_at"
+                )[:batch_size]
+            )
+            if not batch:
+                return archived
+            ArchivedAnswer.objects.bulk_create(
+                ArchivedAnswer(
+                    id=answer_id,
+                    choice_id=choice_id,
+                    ballot_id=ballot_id,
+                    created_at=created_at,
+                )
+                for answer_id, choice_id, ballot_id, created_at in batch
+            )
+            delete_rows(Answer.objects.filter(id__in=[row[0] for row in batch]))
+        archived += len(batch)
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.cache import CacheMiddleware
+
+from polls.routers import reads_primary
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+# Hits, misses and invalidations of poll pages counted by this process.
+def cache_stats():
+    with _stats_lock:
+        stats = {event: _stats[event] for event in ("hits", "misses", "invalidations")}
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def _version_key(poll_id):
+    return f"polls:poll:{poll_id}:version"
+
+
+# Current cache namespace of a poll. A fresh timestamp is used when the version is
+# missing, so an evicted version can never bring back pages of an older namespace.
+def get_poll_version(poll_id):
+    return cache.get_or_set(_version_key(poll_id), time.time_ns, None)
+
+
+# Cache key of data computed for a poll, kept for its timeout regardless of votes.
+def poll_data_key(poll_id, name, *args):
+    return ":".join(["polls:data", str(poll_id), name, *map(str, args)])
+
+
+# Dropping every cached page of given polls by moving them to a new namespace.
+def invalidate_polls(*poll_ids):
+    for poll_id in set(poll_ids):
+        try:
+            cache.incr(_version_key(poll_id))
+        except ValueError:
+            pass
+        _count("invalidations")
+
+
+class PollCacheMiddleware(CacheMiddleware):
+    def process_request(self, request):
+        response = super().process_request(request)
+        if request.method in ("GET", "HEAD"):
+            _count("misses" if response is None else "hits")
+        return response
+
+
+# Running a view through a cache middleware. Clients pinned to the primary database
+# after voting skip the cache, which may hold a page read from a replica that lags
+# behind their vote. The timeout only applies to pages without a max-age: pages
+# read from replicas carry one of POLLS_REPLICA_LAG seconds and are stored no
+# longer, so a tally read before replication caught up expires with the lag.
+def _cached_view(
+    middleware_class, view_func, timeout, key_prefix, request, args, kwargs
+):
+    if settings.POLLS_READ_REPLICAS and reads_primary(request):
+        return view_func(request, *args, **kwargs)
+    middleware = middleware_class(
+        lambda request: view_func(request, *args, **kwargs),
+        cache_timeout=timeout,
+        key_prefix=key_prefix,
+    )
+    return middleware(request)
+
+
+# Like cache_page, for views reading replicas.
+def cache_replica_page(timeout):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return _cached_view(
+                CacheMiddleware,
+                view_func,
+                timeout,
+                settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+                request,
+                args,
+                kwargs,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+# Like cache_replica_page, but keyed by the poll's version so votes only expire
+# that poll.
+def cache_poll_page(timeout):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            poll_id = kwargs.get("poll_id", kwargs.get("pk"))
+            return _cached_view(
+                PollCacheMiddleware,
+                view_func,
+                timeout,
+                f"polls.poll.{poll_id}.{get_poll_version(poll_id)}",
+                request,
+                args,
+                kwargs,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,164 @@
+import random
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from polls.models import (
+    Answer,
+    ArchivedAnswer,
+    Choice,
+    Question,
+    VoteCounterShard,
+)
+
+
+def _group_by_step(choice_ids, amount):
+    steps = defaultdict(list)
+    for choice_id, times in Counter(choice_ids).items():
+        steps[times * amount].append(choice_id)
+    return steps
+
+
+# Applying a step to one shard of each choice, rolled back unless every shard row
+# already exists so that a retry after inserting the missing rows can't double count.
+def _bump_shards(choice_ids, shard, step):
+    with transaction.atomic():
+        updated = VoteCounterShard.objects.filter(
+            choice_id__in=choice_ids, shard=shard
+        ).update(count=F("count") + step)
+        if updated != len(choice_ids):
+            transaction.set_rollback(True)
+    return updated == len(choice_ids)
+
+
+# Adding "amount" votes to every given choice. All choices of one call land on
+# the same randomly picked shard, so a submission costs one UPDATE per distinct
+# step and shard rows are only inserted the first time they are hit.
+def increment_votes(choice_ids, amount=1):
+    shard = random.randrange(settings.POLLS_VOTE_COUNTER_SHARDS)
+
+    for step, ids in _group_by_step(choice_ids, amount).items():
+        while not _bump_shards(ids, shard, step):
+            VoteCounterShard.objects.bulk_create(
+                [
+                    VoteCounterShard(choice_id=choice_id, shard=shard)
+                    for choice_id in ids
+                ],
+                ignore_conflicts=True,
+            )
+
+
+def decrement_votes(choice_ids):
+    increment_votes(choice_ids, amount=-1)
+
+
+# Annotating choices with "total_votes", the compacted tally plus pending shards.
+def annotate_vote_totals(queryset):
+    shard_sum = (
+        VoteCounterShard.objects.filter(choice=OuterRef("pk"))
+        .order_by()
+        .values("choice")
+        .annotate(total=Sum("count"))
+        .values("total")
+    )
+    return queryset.annotate(
+        total_votes=F("vote_count") + Coalesce(Subquery(shard_sum), 0)
+    )
+
+
+# Annotating polls with question_count and answer_count, as correlated subqueries
+# so a page of polls costs a single query.
+def annotate_poll_totals(queryset):
+    return queryset.annotate(
+        question_count=Coalesce(
+            Subquery(
+                Question.objects.filter(poll=OuterRef("pk"))
+                .order_by()
+                .values("poll")
+                .annotate(total=Count("id"))
+                .values("total")
+            ),
+            0,
+        ),
+        answer_count=Coalesce(
+            Subquery(
+                Choice.objects.filter(question__poll=OuterRef("pk"))
+                .order_by()
+                .values("question__poll")
+                .annotate(total=Sum("vote_count"))
+                .values("total")
+            ),
+            0,
+        )
+        + Coalesce(
+            Subquery(
+                VoteCounterShard.objects.filter(choice__question__poll=OuterRef("pk"))
+                .order_by()
+                .values("choice__question__poll")
+                .annotate(total=Sum("count"))
+                .values("total")
+            ),
+            0,
+        ),
+    )
+
+
+# Folding counter shards into Choice.vote_count, returns number of folded shards.
+def compact_votes(batch_size=1000):
+    folded = 0
+    while True:
+        with transaction.atomic():
+            shards = list(
+                VoteCounterShard.objects.select_for_update()
+                .order_by("id")
+                .values_list("id", "choice_id", "count")[:batch_size]
+            )
+            if not shards:
+                return folded
+
+            totals = defaultdict(int)
+            for _, choice_id, count in shards:
+                totals[choice_id] += count
+
+            steps = defaultdict(list)
+            for choice_id, total in totals.items():
+                if total:
+                    steps[total].append(choice_id)
+            for step, ids in steps.items():
+                Choice.objects.filter(id__in=ids).update(
+                    vote_count=F("vote_count") + step
+                )
+
+            VoteCounterShard.objects.filter(
+                id__in=[shard_id for shard_id, _, _ in shards]
+            ).delete()
+            folded += len(shards)
+
+
+# Recomputing the tally of every choice (or choices of given polls) from live and
+# archived answers.
+def reconcile_votes(poll_ids=None):
+    def count(model):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(choice=OuterRef("pk"))
+                .order_by()
+                .values("choice")
+                .annotate(total=Count("id"))
+                .values("total")
+            ),
+            0,
+        )
+
+    choices = Choice.objects.all()
+    shards = VoteCounterShard.objects.all()
+    if poll_ids is not None:
+        choices = choices.filter(question__poll_id__in=poll_ids)
+        shards = shards.filter(choice__question__poll_id__in=poll_ids)
+
+    with transaction.atomic():
+        shards.delete()
+        return choices.update(vote_count=count(Answer) + count(ArchivedAnswer))
@@ -0,0 +1,142 @@
+import csv
+import heapq
+import itertools
+
+from polls.models import Answer, ArchivedAnswer
+from polls.structure import get_poll_structure
+
+COLUMNS = [
+    "answer_id",
+    "poll_id",
+    "question_id",
+    "question",
+    "choice_id",
+    "choice",
+    "created_at",
+]
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+# Answers of a poll with ids above "after", live and archived, in id order. Rows
+# are streamed from the database "chunk_size" at a time, question and choice texts
+# come from the poll structure, so memory doesn't grow with the number of answers.
+def answer_rows(poll_id, after=0, chunk_size=2000):
+    structure = get_poll_structure(poll_id)
+    questions = {question.id: question for question in structure.questions}
+    choices = {
+        choice.id: choice
+        for question in structure.questions
+        for choice in question.choices
+    }
+
+    def stream(model):
+        return (
+            model.objects.filter(choice_id__in=list(choices), id__gt=after)
+            .order_by("id")
+            .values_list("id", "choice_id", "created_at")
+            .iterator(chunk_size=chunk_size)
+        )
+
+    for answer_id, choice_id, created_at in heapq.merge(
+        stream(ArchivedAnswer), stream(Answer)
+    ):
+        question = questions[structure.choice_questions[choice_id]]
+        yield (
+            answer_id,
+            poll_id,
+            question.id,
+            question.question_text,
+            choice_id,
+            choices[choice_id].choice_text,
+            created_at,
+        )
+
+
+# File-like object handing back what the csv and parquet writers write to it.
+class _Pipe:
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data) if isinstance(data, memoryview) else data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def csv_chunks(rows, header=True):
+    pipe = _Pipe()
+    writer = csv.writer(pipe)
+    if header:
+        writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        yield from pipe.drain()
+
+
+# Parquet file as a stream of bytes, one zstd compressed row group per
+# "row_group_size" answers. pyarrow is optional, ExportUnavailable is raised when
+# it's missing.
+def parquet_chunks(rows, row_group_size=50000):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportUnavailable("Parquet export needs pyarrow, pip install pyarrow")
+
+    schema = pyarrow.schema(
+        [
+            ("answer_id", pyarrow.int64()),
+            ("poll_id", pyarrow.int64()),
+            ("question_id", pyarrow.int64()),
+            ("question", pyarrow.string()),
+            ("choice_id", pyarrow.int64()),
+            ("choice", pyarrow.string()),
+            ("created_at", pyarrow.timestamp("us")),
+        ]
+    )
+
+    def generate():
+        pipe = _Pipe()
+        writer = pyarrow.parquet.ParquetWriter(pipe, schema, compression="zstd")
+        for batch in batches(rows, row_group_size):
+            columns = [
+                pyarrow.array(column, type=field.type)
+                for column, field in zip(zip(*batch), schema)
+            ]
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+            yield from pipe.drain()
+        writer.close()
+        yield from pipe.drain()
+
+    return generate()
+
+
+FORMATS = {
+    "csv": (csv_chunks, "text/csv"),
+    "parquet": (parquet_chunks, "application/vnd.apache.parquet"),
+}
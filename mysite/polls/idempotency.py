@@ -0,0 +1,75 @@
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from polls.models import VoteSubmission
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = VoteSubmission._meta.get_field("key").max_length
+
+
+class InvalidKey(ValueError):
+    pass
+
+
+# Idempotency key of a request, None when the client didn't send one.
+def request_key(request):
+    key = request.headers.get(HEADER)
+    if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise InvalidKey(key)
+    return key
+
+
+# Stored (status_code, response) of a submission, None for a new key.
+def stored_response(poll_id, key):
+    return (
+        VoteSubmission.objects.filter(poll_id=poll_id, key=key)
+        .values_list("status_code", "response")
+        .first()
+    )
+
+
+def store_response(poll_id, key, status_code, response):
+    VoteSubmission.objects.create(
+        poll_id=poll_id, key=key, status_code=status_code, response=response
+    )
+
+
+def forget_response(poll_id, key):
+    VoteSubmission.objects.filter(poll_id=poll_id, key=key).delete()
+
+
+# Running "submit" at most once per key and returning (status_code, response,
+# replayed). Successful responses are stored in the transaction of the
+# submission, so a concurrent duplicate that loses the insert rolls back its
+# votes and replays the response of the winner.
+def submit_once(poll_id, key, submit):
+    stored = stored_response(poll_id, key)
+    if stored is not None:
+        return (*stored, True)
+
+    with transaction.atomic():
+        status_code, response = submit()
+        if status_code >= 300:
+            return status_code, response, False
+        try:
+            with transaction.atomic():
+                store_response(poll_id, key, status_code, response)
+        except IntegrityError:
+            transaction.set_rollback(True)
+        else:
+            return status_code, response, False
+    return (*stored_response(poll_id, key), True)
+
+
+# Deleting submissions older than the ttl in batches, returns how many went.
+def expire_submissions(ttl=None, batch_size=10000):
+    if ttl is None:
+        ttl = datetime.timedelta(seconds=settings.POLLS_IDEMPOTENCY_TTL)
+    expired = VoteSubmission.objects.filter(created_at__lt=timezone.now() - ttl)
+    deleted = 0
+    while ids := list(expired.values_list("id", flat=True)[:batch_size]):
+        deleted += VoteSubmission.objects.filter(id__in=ids).delete()[0]
+    return deleted
@@ -0,0 +1,219 @@
+import csv
+import itertools
+import json
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from polls.models import Choice, Poll, Question
+
+# CSV imports have one row per choice. Consecutive rows with the same poll name
+# belong to one poll, consecutive rows with the same question text to one question.
+CSV_COLUMNS = ["poll_name", "question_text", "pub_date", "choice_text"]
+MAX_ERRORS = 50
+
+
+class QuestionDefinition(NamedTuple):
+    question_text: str
+    pub_date: object
+    choices: list
+
+
+class PollDefinition(NamedTuple):
+    poll_name: str
+    questions: list
+
+
+# Errors of an import file, raised before anything is written.
+class InvalidImport(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class _Validator:
+    def __init__(self):
+        self.errors = []
+        self.now = timezone.now()
+
+    def error(self, where, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"{where}: {message}")
+
+    def text(self, where, value, model, field):
+        max_length = model._meta.get_field(field).max_length
+        if not isinstance(value, str) or not value.strip():
+            self.error(where, f"{field} is required")
+        elif len(value) > max_length:
+            self.error(where, f"{field} is longer than {max_length} characters")
+        else:
+            return value.strip()
+        return ""
+
+    def pub_date(self, where, value):
+        if value in (None, ""):
+            return self.now
+        try:
+            parsed = parse_datetime(value)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is None:
+            self.error(where, f"invalid pub_date {value!r}")
+        elif settings.USE_TZ and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        elif not settings.USE_TZ and timezone.is_aware(parsed):
+            parsed = timezone.make_naive(parsed)
+        return parsed
+
+    def poll(self, where, poll_name, questions):
+        if not questions:
+            self.error(where, "a poll needs at least one question")
+        for index, question in enumerate(questions):
+            if not question.choices:
+                self.error(f"{where}.questions[{index}]", "a question needs choices")
+        return PollDefinition(self.text(where, poll_name, Poll, "poll_name"), questions)
+
+    def check(self, polls):
+        if not polls and not self.errors:
+            self.error("file", "no polls found")
+        if self.errors:
+            raise InvalidImport(self.errors)
+        return polls
+
+
+# Polls of a JSON document, either a list of polls or {"polls": [...]}:
+#
+#   [{"poll_name": "...", "questions": [
+#       {"question_text": "...", "pub_date": "2024-01-01T00:00", "choices": ["..."]}
+#   ]}]
+#
+# Choices are strings or {"choice_text": "..."} objects, pub_date is optional.
+def parse_json(data):
+    validator = _Validator()
+    if isinstance(data, dict):
+        data = data.get("polls")
+    if not isinstance(data, list):
+        raise InvalidImport(["file: expected a list of polls"])
+
+    polls = []
+    for poll_index, poll in enumerate(data):
+        where = f"polls[{poll_index}]"
+        if not isinstance(poll, dict):
+            validator.error(where, "expected an object")
+            continue
+        questions = []
+        raw_questions = poll.get("questions")
+        if not isinstance(raw_questions, list):
+            raw_questions = []
+        for question_index, question in enumerate(raw_questions):
+            question_where = f"{where}.questions[{question_index}]"
+            if not isinstance(question, dict):
+                validator.error(question_where, "expected an object")
+                continue
+            choices = []
+            raw_choices = question.get("choices")
+            if not isinstance(raw_choices, list):
+                raw_choices = []
+            for choice_index, choice in enumerate(raw_choices):
+                if isinstance(choice, dict):
+                    choice = choice.get("choice_text")
+                choices.append(
+                    validator.text(
+                        f"{question_where}.choices[{choice_index}]",
+                        choice,
+                        Choice,
+                        "choice_text",
+                    )
+                )
+            questions.append(
+                QuestionDefinition(
+                    validator.text(
+                        question_where,
+                        question.get("question_text"),
+                        Question,
+                        "question_text",
+                    ),
+                    validator.pub_date(question_where, question.get("pub_date")),
+                    choices,
+                )
+            )
+        polls.append(validator.poll(where, poll.get("poll_name"), questions))
+    return validator.check(polls)
+
+
+# Polls of CSV lines with a CSV_COLUMNS header, pub_date may be left empty.
+def parse_csv(lines):
+    validator = _Validator()
+    reader = csv.DictReader(lines)
+    missing = set(CSV_COLUMNS) - set(reader.fieldnames or [])
+    if missing:
+        raise InvalidImport([f"header: missing columns {', '.join(sorted(missing))}"])
+
+    polls = []
+    lines = ((reader.line_num, row) for row in reader)
+    for poll_name, rows in itertools.groupby(lines, lambda line: line[1]["poll_name"]):
+        questions = []
+        for question_text, rows in itertools.groupby(
+            rows, lambda line: line[1]["question_text"]
+        ):
+            rows = list(rows)
+            where = f"line {rows[0][0]}"
+            questions.append(
+                QuestionDefinition(
+                    validator.text(where, question_text, Question, "question_text"),
+                    validator.pub_date(where, rows[0][1]["pub_date"]),
+                    [
+                        validator.text(
+                            f"line {line}", row["choice_text"], Choice, "choice_text"
+                        )
+                        for line, row in rows
+                    ],
+                )
+            )
+        polls.append(validator.poll(f"poll {len(polls) + 1}", poll_name, questions))
+    return validator.check(polls)
+
+
+def parse_file(file, file_format):
+    if file_format == "csv":
+        return parse_csv(file)
+    try:
+        data = json.load(file)
+    except ValueError as error:
+        raise InvalidImport([f"file: invalid JSON, {error}"])
+    return parse_json(data)
+
+
+# Creating validated polls with one bulk insert per table and batch, all in one
+# transaction so a failing import leaves nothing behind. Returns the ids of the
+# created polls, in the order of the definitions.
+def import_polls(polls, batch_size=1000):
+    with transaction.atomic():
+        created = Poll.objects.bulk_create(
+            [Poll(poll_name=poll.poll_name) for poll in polls], batch_size=batch_size
+        )
+        questions = Question.objects.bulk_create(
+            [
+                Question(
+                    poll_id=poll.id,
+                    question_text=question.question_text,
+                    pub_date=question.pub_date,
+                )
+                for poll, definition in zip(created, polls)
+                for question in definition.questions
+            ],
+            batch_size=batch_size,
+        )
+        definitions = (question for poll in polls for question in poll.questions)
+        Choice.objects.bulk_create(
+            [
+                Choice(question_id=question.id, choice_text=choice_text)
+                for question, definition in zip(questions, definitions)
+                for choice_text in definition.choices
+            ],
+            batch_size=batch_size,
+        )
+    return [poll.id for poll in created]
@@ -0,0 +1,159 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+_rejections = Counter()
+_rejections_lock = threading.Lock()
+
+
+def _count(reason):
+    with _rejections_lock:
+        _rejections[reason] += 1
+
+
+# Vote requests rejected by this process, per reason.
+def rejection_stats():
+    with _rejections_lock:
+        return {reason: _rejections[reason] for reason in ("rate_limited", "voted")}
+
+
+# Token bucket per key kept in the shared cache, refilled with "rate" tokens per
+# second up to "burst". Keys found empty are remembered in the process until their
+# next token is due, so a burst from one client is rejected without cache round
+# trips. Buckets are read and written without a lock across processes, so
+# concurrent requests of one client on several workers may overshoot a little.
+class TokenBucketLimiter:
+    def __init__(self, rate, burst, max_local_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_local_keys = max_local_keys
+        self.timeout = math.ceil(burst / rate) + 1
+        self._blocked = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        now = time.time()
+        if self.blocked(key, now):
+            return False
+
+        cache_key = f"polls:bucket:{key}"
+        tokens, updated = cache.get(cache_key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self._block(key, now + (1 - tokens) / self.rate)
+        cache.set(cache_key, (tokens, now), self.timeout)
+        return allowed
+
+    # Whether the key was found empty in this process and has no token yet.
+    def blocked(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            blocked_until = self._blocked.get(key)
+            if blocked_until is not None:
+                if now < blocked_until:
+                    return True
+                del self._blocked[key]
+        return False
+
+    def _block(self, key, until):
+        with self._lock:
+            self._blocked[key] = until
+            self._blocked.move_to_end(key)
+            while len(self._blocked) > self.max_local_keys:
+                self._blocked.popitem(last=False)
+
+
+_limiters = {}
+
+
+# Limiter configured by POLLS_VOTE_LIMITER, None when rate limiting is off.
+def get_limiter():
+    path = settings.POLLS_VOTE_LIMITER
+    if path is None:
+        return None
+    config = (path, settings.POLLS_VOTE_RATE, settings.POLLS_VOTE_BURST)
+    if config not in _limiters:
+        _limiters[config] = import_string(path)(
+            rate=settings.POLLS_VOTE_RATE, burst=settings.POLLS_VOTE_BURST
+        )
+    return _limiters[config]
+
+
+# Seconds a rate limited client should wait for its next token.
+def retry_after():
+    return math.ceil(1 / settings.POLLS_VOTE_RATE)
+
+
+# Address of the client of a request. Behind a proxy, POLLS_TRUSTED_PROXY_HEADER
+# names the header it sets, like "HTTP_X_FORWARDED_FOR". The last address is the
+# one the proxy saw, earlier ones are sent by the client and may be forged.
+def client_ip(request):
+    header = settings.POLLS_TRUSTED_PROXY_HEADER
+    if header and request.META.get(header):
+        return request.META[header].split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+# Rate limit key of a request: its session cookie when it sends one, otherwise its
+# address. Keys are computed before any database work, so the cookie isn't checked
+# here, see allow_vote.
+def client_key(request):
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        return f"session:{session_key}"
+    return f"ip:{client_ip(request)}"
+
+
+# Whether a vote request is within the rate limit of its client, keyed by the
+# function POLLS_VOTE_LIMIT_KEY names. Rejections take no query. Session keys are
+# only checked once their bucket let the request through: cookies of sessions that
+# don't exist, like forged ones, are limited by address instead, and while the
+# address is blocked its session cookies are rejected without loading them.
+def allow_vote(request):
+    limiter = get_limiter()
+    if limiter is None:
+        return True
+    key = import_string(settings.POLLS_VOTE_LIMIT_KEY)(request)
+    allowed = limiter.allow(key)
+    if allowed and key.startswith("session:"):
+        address = f"ip:{client_ip(request)}"
+        if limiter.blocked(address):
+            allowed = False
+        else:
+            # Loading the session drops its key when it doesn't exist.
+            request.session.get("voted_polls")
+            if not request.session.session_key:
+                allowed = limiter.allow(address)
+    if allowed:
+        return True
+    _count("rate_limited")
+    return False
+
+
+# Whether the session of a request already voted in a poll. Clients without a
+# session, like most api clients, are never considered to have voted.
+def already_voted(request, poll_id):
+    if not settings.POLLS_ONE_VOTE_PER_SESSION or not request.session.session_key:
+        return False
+    voted = poll_id in request.session.get("voted_polls", [])
+    if voted:
+        _count("voted")
+    return voted
+
+
+# Remembering a vote in the session, creating the session only when asked to.
+def mark_voted(request, poll_id, create=False):
+    if not settings.POLLS_ONE_VOTE_PER_SESSION:
+        return
+    if create or request.session.session_key:
+        request.session["voted_polls"] = request.session.get("voted_polls", []) + [
+            poll_id
+        ]
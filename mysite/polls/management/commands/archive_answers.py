@@ -0,0 +1,51 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls.archive import archive_answers
+from polls.models import Poll
+
+
+# Moves answers of old or given polls out of the answer table, meant to run
+# periodically after rollup_answers.
+class Command(BaseCommand):
+    help = "Move answers of old polls into the answer archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=90,
+            help="Archive polls created more than this many days ago.",
+        )
+        parser.add_argument(
+            "--poll",
+            type=int,
+            action="append",
+            help="Archive this poll regardless of its age, can be repeated.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Answers moved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["poll"]:
+            poll_ids = options["poll"]
+            missing = set(poll_ids) - set(
+                Poll.objects.filter(id__in=poll_ids).values_list("id", flat=True)
+            )
+            if missing:
+                raise CommandError(f"Polls not found: {sorted(missing)}")
+        else:
+            cutoff = timezone.now() - datetime.timedelta(days=options["days"])
+            poll_ids = list(
+                Poll.objects.filter(created_at__lt=cutoff).values_list("id", flat=True)
+            )
+
+        self.stdout.write(f"Archiving answers of {len(poll_ids)} polls...")
+        archived = archive_answers(poll_ids, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} answers."))
@@ -0,0 +1,167 @@
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.models import Poll
+
+
+# Seeds a throwaway test database and measures every polls endpoint through the
+# test client: wall time, SQL queries and peak Python memory per request.
+class Command(BaseCommand):
+    help = "Benchmark the polls views and APIs, optionally against a stored baseline"
+    # Endpoints requested by a signed in user.
+    signed_in = {"analytics"}
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=20)
+        parser.add_argument("--questions", type=int, default=50)
+        parser.add_argument("--choices", type=int, default=5)
+        parser.add_argument("--answers", type=int, default=20)
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Requests per endpoint."
+        )
+        parser.add_argument(
+            "--cached",
+            action="store_true",
+            help="Keep the cache between requests instead of measuring cold requests.",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+        parser.add_argument("--baseline", help="JSON report to compare against.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed relative slowdown or memory growth over the baseline.",
+        )
+
+    # Measuring without the debug toolbar, like in production, and without the vote
+    # limits that would reject repeated votes of one client.
+    @override_settings(
+        DEBUG=False, POLLS_VOTE_LIMITER=None, POLLS_ONE_VOTE_PER_SESSION=False
+    )
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            call_command(
+                "data_generator",
+                polls=options["polls"],
+                questions=options["questions"],
+                choices=options["choices"],
+                answers=options["answers"],
+                seed=0,
+                stdout=open(os.devnull, "w"),
+            )
+            report = {
+                "dataset": {
+                    name: options[name]
+                    for name in ("polls", "questions", "choices", "answers")
+                },
+                "endpoints": self.run_endpoints(options),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            regressions = self.regressions(report, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions found:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def endpoints(self):
+        poll = Poll.objects.order_by("id").first()
+        ballot = {
+            f"choice{question.id}": question.choices.order_by("id").first().id
+            for question in poll.questions.all()
+        }
+        return {
+            "index": ("get", reverse("polls:index"), None),
+            "detail": ("get", reverse("polls:detail", args=(poll.id,)), None),
+            "results": ("get", reverse("polls:results", args=(poll.id,)), None),
+            "vote": ("post", reverse("polls:vote", args=(poll.id,)), ballot),
+            "vote_api": ("post", reverse("polls:vote_api", args=(poll.id,)), ballot),
+            "poll_data": ("get", reverse("polls:poll_data", args=(poll.id,)), None),
+            "analytics": (
+                "get",
+                reverse("polls:poll_analytics", args=(poll.id,)),
+                None,
+            ),
+        }
+
+    def run_endpoints(self, options):
+        client = Client()
+        analyst = Client()
+        analyst.force_login(User.objects.create_user("benchmark"))
+        results = {}
+        for name, (method, url, data) in self.endpoints().items():
+            request = getattr(analyst if name in self.signed_in else client, method)
+            timings = []
+            queries = []
+            for _ in range(options["repeat"]):
+                if not options["cached"]:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = self.consume(request(url, data))
+                    timings.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    raise CommandError(f"{name} answered {response.status_code}")
+                queries.append(len(captured))
+
+            # Tracing slows requests down, so memory is measured in a separate run.
+            if not options["cached"]:
+                cache.clear()
+            tracemalloc.start()
+            self.consume(request(url, data))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = {
+                "wall_ms": round(statistics.median(timings) * 1000, 3),
+                "queries": max(queries),
+                "peak_kb": round(peak / 1024, 1),
+            }
+        return results
+
+    # Streaming responses only do their work while their content is read.
+    def consume(self, response):
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def regressions(self, report, baseline, tolerance):
+        regressions = []
+        for name, result in report["endpoints"].items():
+            expected = baseline["endpoints"].get(name)
+            if expected is None:
+                continue
+            if result["queries"] > expected["queries"]:
+                regressions.append(
+                    f"{name}: {result['queries']} queries, "
+                    f"baseline {expected['queries']}"
+                )
+            for metric in ("wall_ms", "peak_kb"):
+                if result[metric] > expected[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{name}: {metric} {result[metric]}, baseline {expected[metric]}"
+                    )
+        return regressions
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.utils import timezone
+
+from polls.counters import compact_votes, increment_votes
+from polls.models import Choice, Poll, Question
+
+
+# Single counter column, every voter updates the same row.
+def row_vote(choice_id):
+    Choice.objects.filter(id=choice_id).update(vote_count=F("vote_count") + 1)
+
+
+# Sharded counter, voters are spread across POLLS_VOTE_COUNTER_SHARDS rows.
+def sharded_vote(choice_id):
+    increment_votes([choice_id])
+
+
+STRATEGIES = {"row": row_vote, "sharded": sharded_vote}
+
+
+# Measures throughput of concurrent voters hammering one choice.
+class Command(BaseCommand):
+    help = "Benchmark concurrent votes on a single choice, row vs sharded counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--voters", type=int, default=8, help="Concurrent threads.")
+        parser.add_argument(
+            "--votes", type=int, default=200, help="Votes cast by each voter."
+        )
+
+    def handle(self, *args, **options):
+        poll = Poll.objects.create(poll_name="Counter benchmark")
+        question = Question.objects.create(
+            question_text="Benchmark", pub_date=timezone.now(), poll=poll
+        )
+        choice = Choice.objects.create(question=question, choice_text="Hot choice")
+
+        try:
+            for name, strategy in STRATEGIES.items():
+                elapsed, errors = self.run_voters(
+                    strategy, choice.id, options["voters"], options["votes"]
+                )
+                compact_votes()
+                choice.refresh_from_db()
+                cast = options["voters"] * options["votes"] - errors
+                self.stdout.write(
+                    f"{name:>8}: {cast / elapsed:10.1f} votes/s "
+                    f"({cast} votes in {elapsed:.2f}s, {errors} errors, "
+                    f"counted {choice.vote_count})"
+                )
+                Choice.objects.filter(id=choice.id).update(vote_count=0)
+        finally:
+            poll.delete()
+
+    def run_voters(self, strategy, choice_id, voters, votes):
+        errors = []
+
+        def voter():
+            failed = 0
+            for _ in range(votes):
+                try:
+                    strategy(choice_id)
+                except OperationalError:
+                    failed += 1
+            errors.append(failed)
+            connection.close()
+
+        threads = [threading.Thread(target=voter) for _ in range(voters)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, sum(errors)
@@ -0,0 +1,103 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Answer, Choice, Poll, Question
+from polls.voting import delete_rows
+from polls.writer import answer_writer
+
+
+def percentile(latencies, percent):
+    return statistics.quantiles(latencies, n=100, method="inclusive")[percent - 1]
+
+
+# Compares latency of the synchronous vote API with the async, queued one.
+class Command(BaseCommand):
+    help = "Load test the synchronous and async vote APIs and report p50/p99 latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--questions", type=int, default=10)
+
+    # Measuring without the debug toolbar, like in production, and without the vote
+    # limits that would reject repeated votes of one client.
+    @override_settings(
+        DEBUG=False, POLLS_VOTE_LIMITER=None, POLLS_ONE_VOTE_PER_SESSION=False
+    )
+    def handle(self, *args, **options):
+        poll = Poll.objects.create(poll_name="Vote API benchmark")
+        ballot = {}
+        for index in range(options["questions"]):
+            question = Question.objects.create(
+                question_text=f"Question {index}", pub_date=timezone.now(), poll=poll
+            )
+            choices = Choice.objects.bulk_create(
+                [Choice(question=question, choice_text=f"Choice {i}") for i in range(5)]
+            )
+            ballot[f"choice{question.id}"] = choices[0].id
+
+        try:
+            self.report(
+                "sync", *self.run_sync(poll, ballot, options), options["requests"]
+            )
+            start = time.perf_counter()
+            results = self.run_async(poll, ballot, options)
+            self.report("async", *results, options["requests"])
+            answer_writer.stop()
+            self.stdout.write(
+                f"async writer drained in {time.perf_counter() - start:.2f}s total"
+            )
+        finally:
+            # Skipping per-answer signals, the whole poll is removed anyway.
+            delete_rows(Answer.objects.filter(choice__question__poll=poll))
+            poll.delete()
+
+    def run_sync(self, poll, ballot, options):
+        url = reverse("polls:vote_api", args=(poll.id,))
+
+        def post(_):
+            start = time.perf_counter()
+            response = Client().post(url, ballot)
+            connection.close()
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as executor:
+            results = list(executor.map(post, range(options["requests"])))
+        return results, time.perf_counter() - start
+
+    def run_async(self, poll, ballot, options):
+        url = reverse("polls:vote_async", args=(poll.id,))
+
+        async def load():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(options["concurrency"])
+
+            async def post():
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(url, ballot)
+                    return time.perf_counter() - start, response.status_code
+
+            return await asyncio.gather(*(post() for _ in range(options["requests"])))
+
+        start = time.perf_counter()
+        results = asyncio.run(load())
+        return results, time.perf_counter() - start
+
+    def report(self, name, results, elapsed, requests):
+        latencies = [latency * 1000 for latency, _ in results]
+        errors = sum(1 for _, status_code in results if status_code >= 300)
+        self.stdout.write(
+            f"{name:>5}: p50 {percentile(latencies, 50):7.2f}ms  "
+            f"p99 {percentile(latencies, 99):7.2f}ms  "
+            f"{requests / elapsed:8.1f} req/s  {errors} errors"
+        )
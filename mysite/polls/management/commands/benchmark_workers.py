@@ -0,0 +1,193 @@
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.caching import cache_stats
+from polls.models import Poll
+from polls.structure import get_poll_structure
+
+# Environment of the compared setups. "isolated" is how the project used to run:
+# a LocMem cache per worker, a connection per request and SQLite's rollback
+# journal. "shared" uses a file cache shared by the workers, persistent
+# connections and WAL mode.
+SETUPS = {
+    "isolated": {
+        "POLLS_CACHE": "locmem",
+        "POLLS_CONN_MAX_AGE": "0",
+        "POLLS_SQLITE_WAL": "0",
+    },
+    "shared": {
+        "POLLS_CACHE": "file",
+        "POLLS_CONN_MAX_AGE": "60",
+        "POLLS_SQLITE_WAL": "1",
+    },
+}
+
+
+def percentile(latencies, percent):
+    return statistics.quantiles(latencies, n=100, method="inclusive")[percent - 1]
+
+
+# Runs several worker processes against one SQLite database, each reading results
+# pages and voting through the test client, once per setup in SETUPS. Example:
+#
+#   python manage.py benchmark_workers --workers 4 --requests 400
+#
+# Every setup starts from a copy of the same generated database.
+class Command(BaseCommand):
+    help = "Benchmark results and vote views with several worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--requests", type=int, default=400, help="Requests per worker."
+        )
+        parser.add_argument(
+            "--vote-ratio",
+            type=float,
+            default=0.05,
+            help="Share of requests that are votes, the rest read results.",
+        )
+        parser.add_argument("--polls", type=int, default=40)
+        parser.add_argument("--questions", type=int, default=20)
+        parser.add_argument("--setup", choices=SETUPS, action="append")
+        # Used by the worker processes the command starts.
+        parser.add_argument(
+            "--worker", type=int, help="Run as the worker with this id."
+        )
+        parser.add_argument("--start-at", type=float, default=0)
+
+    def handle(self, *args, **options):
+        if options["worker"] is not None:
+            return self.run_worker(options)
+
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "base.sqlite3")
+            self.manage(database, {}, "migrate", "--verbosity", "0")
+            self.manage(
+                database,
+                {},
+                "data_generator",
+                f"--polls={options['polls']}",
+                f"--questions={options['questions']}",
+                "--answers=10",
+                "--seed=0",
+            )
+            for name in options["setup"] or SETUPS:
+                copy = os.path.join(directory, f"{name}.sqlite3")
+                shutil.copy(database, copy)
+                env = {**SETUPS[name], "POLLS_CACHE_LOCATION": f"{copy}.cache"}
+                self.report(name, self.run_workers(copy, env, options))
+
+    def manage(self, database, env, *args):
+        subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), *args],
+            env={**os.environ, **env, "POLLS_DB_NAME": database},
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def run_workers(self, database, env, options):
+        # Workers import Django first and then start together.
+        start_at = time.time() + 3
+        processes = [
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    str(settings.BASE_DIR / "manage.py"),
+                    "benchmark_workers",
+                    f"--worker={worker}",
+                    f"--start-at={start_at}",
+                    f"--requests={options['requests']}",
+                    f"--vote-ratio={options['vote_ratio']}",
+                ],
+                env={**os.environ, **env, "POLLS_DB_NAME": database},
+                stdout=subprocess.PIPE,
+            )
+            for worker in range(options["workers"])
+        ]
+        results = []
+        for process in processes:
+            output = process.communicate()[0]
+            if process.returncode:
+                raise CommandError(f"Worker failed with {process.returncode}")
+            results.append(json.loads(output))
+        return results
+
+    def report(self, name, results):
+        elapsed = max(result["elapsed"] for result in results)
+        requests = sum(
+            len(result["results"]) + len(result["vote"]) for result in results
+        )
+        hits = sum(result["cache"]["hits"] for result in results)
+        lookups = hits + sum(result["cache"]["misses"] for result in results)
+        self.stdout.write(
+            f"{name}: {requests / elapsed:.1f} req/s, "
+            f"results cache hit rate {hits / max(lookups, 1):.0%}"
+        )
+        for endpoint in ("results", "vote"):
+            latencies = [
+                latency * 1000 for result in results for latency in result[endpoint]
+            ]
+            errors = sum(result["errors"][endpoint] for result in results)
+            self.stdout.write(
+                f"  {endpoint:>7}: p50 {percentile(latencies, 50):7.2f}ms  "
+                f"p99 {percentile(latencies, 99):7.2f}ms  {errors} errors"
+            )
+
+    @override_settings(
+        DEBUG=False, POLLS_VOTE_LIMITER=None, POLLS_ONE_VOTE_PER_SESSION=False
+    )
+    def run_worker(self, options):
+        rng = random.Random(options["worker"])
+        ballots = {}
+        for poll_id in Poll.objects.values_list("id", flat=True):
+            structure = get_poll_structure(poll_id)
+            ballots[poll_id] = [
+                {
+                    f"choice{question.id}": rng.choice(question.choices).id
+                    for question in structure.questions
+                }
+                for _ in range(10)
+            ]
+
+        client = Client(raise_request_exception=False)
+        latencies = {"results": [], "vote": []}
+        errors = {"results": 0, "vote": 0}
+        time.sleep(max(0, options["start_at"] - time.time()))
+        start = time.perf_counter()
+        for _ in range(options["requests"]):
+            poll_id = rng.choice(list(ballots))
+            endpoint = "vote" if rng.random() < options["vote_ratio"] else "results"
+            url = reverse(f"polls:{endpoint}", args=(poll_id,))
+
+            request_start = time.perf_counter()
+            if endpoint == "vote":
+                response = client.post(url, rng.choice(ballots[poll_id]))
+            else:
+                response = client.get(url)
+            latencies[endpoint].append(time.perf_counter() - request_start)
+            if response.status_code >= 400:
+                errors[endpoint] += 1
+
+        self.stdout.write(
+            json.dumps(
+                {
+                    **latencies,
+                    "errors": errors,
+                    "elapsed": time.perf_counter() - start,
+                    "cache": cache_stats(),
+                }
+            )
+        )
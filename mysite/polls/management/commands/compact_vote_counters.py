@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from polls.counters import compact_votes
+
+
+# Folds pending vote counter shards into Choice.vote_count, meant to run periodically.
+class Command(BaseCommand):
+    help = "Fold vote counter shards into choice vote counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of shard rows folded per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Compacting vote counters...")
+        folded = compact_votes(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} counter shards."))
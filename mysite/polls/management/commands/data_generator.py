@@ -1,34 +1,190 @@
+import datetime
+import itertools
 import random
+import time
+
 from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
 from django.utils import timezone
-from polls.models import Question, Answer, Choice, Poll
+from polls.caching import invalidate_polls
+from polls.models import Question, Answer, Ballot, Choice, Poll
+from polls.structure import invalidate_poll_structure
+
 
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
 
-# This will genrate a large sample of data for poll, question, and choice.
+
+# This will genrate a large sample of data for poll, question, choice, ballot and
+# answer.
 class Command(BaseCommand):
     help = "Create Sample Data"
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=10)
+        parser.add_argument("--questions", type=int, default=50, help="Per poll.")
+        parser.add_argument("--choices", type=int, default=5, help="Per question.")
+        parser.add_argument(
+            "--answers", type=int, default=1, help="Mean answers per choice."
+        )
+        parser.add_argument(
+            "--distribution",
+            choices=["uniform", "zipf"],
+            default="uniform",
+            help="How answers of a question are spread over its choices.",
+        )
+        parser.add_argument(
+            "--zipf-exponent",
+            type=float,
+            default=1.2,
+            help="Skew of the zipf distribution.",
+        )
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=30,
+            help="Answers are created at random times within this many past days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=50000)
+        parser.add_argument("--seed", type=int, help="Seed for reproducible data.")
+
+    def handle(self, *args, **options):
         self.stdout.write("Creating sample data...")
+        self.options = options
+        self.random = random.Random(options["seed"])
+        self.now = timezone.now()
+        start = time.perf_counter()
 
-        for poll_index in range(1, 11):
-            poll = Poll.objects.create(poll_name=f"Poll {poll_index}")
+        polls = Poll.objects.bulk_create(
+            Poll(poll_name=f"Poll {poll_index}")
+            for poll_index in range(1, options["polls"] + 1)
+        )
+        total_ballots = total_answers = 0
+        for poll_index, poll in enumerate(polls, start=1):
+            with transaction.atomic():
+                choices = self.create_choices(poll, poll_index)
+            ballots, answers = self.create_answers(poll, choices)
+            # Bulk inserts send no signals, and ids of polls rolled back or deleted
+            # before may be reused, so cached structures and pages are dropped here.
+            invalidate_poll_structure(poll.id)
+            invalidate_polls(poll.id)
+            total_ballots += ballots
+            total_answers += answers
 
-            num_questions = 5 if poll_index <= 5 else 50
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sample data created successfully: {len(polls)} polls, "
+                f"{total_ballots} ballots and {total_answers} answers in {elapsed:.1f}s "
+                f"({total_answers / elapsed:.0f} answers/s)."
+            )
+        )
 
-            for question_index in range(1, num_questions + 1):
-                question = Question.objects.create(
-                    question_text=f"Question {poll_index}-{question_index}",
-                    pub_date=timezone.now(),
-                    poll=poll,
-                )
+    def create_choices(self, poll, poll_index):
+        questions = Question.objects.bulk_create(
+            Question(
+                question_text=f"Question {poll_index}-{question_index}",
+                pub_date=self.now,
+                poll=poll,
+            )
+            for question_index in range(1, self.options["questions"] + 1)
+        )
 
-                for choice_index in range(1, 6):
-                    choice = Choice.objects.create(
+        # Vote counts are known upfront, so counters are written with the choices.
+        choices = []
+        for question_index, question in enumerate(questions, start=1):
+            for choice_index, vote_count in enumerate(self.answer_counts(), start=1):
+                choices.append(
+                    Choice(
                         question=question,
                         choice_text=f"Choice {poll_index}-{question_index}-{choice_index}",
+                        vote_count=vote_count,
                     )
-                    if poll_index <= 3:
-                        Answer.objects.create(choice=choice)
+                )
+        return Choice.objects.bulk_create(
+            choices, batch_size=self.options["batch_size"]
+        )
+
+    # Answer counts for the choices of one question.
+    def answer_counts(self):
+        num_choices = self.options["choices"]
+        mean = self.options["answers"]
+        if self.options["distribution"] == "uniform":
+            return [self.random.randint(0, 2 * mean) for _ in range(num_choices)]
+
+        weights = [
+            1 / rank ** self.options["zipf_exponent"]
+            for rank in range(1, num_choices + 1)
+        ]
+        self.random.shuffle(weights)
+        total = mean * num_choices
+        return [round(total * weight / sum(weights)) for weight in weights]
+
+    # Ballots and answers are written with executemany instead of bulk_create:
+    # building a model instance per row is what limits bulk_create to ~10k answers/s.
+    # Each question's answers go to distinct random ballots, so a poll gets as many
+    # ballots as its most answered question and others leave some unanswered.
+    def create_answers(self, poll, choices):
+        questions = [
+            list(question_choices)
+            for _, question_choices in itertools.groupby(
+                choices, lambda choice: choice.question_id
+            )
+        ]
+        answer_counts = [
+            sum(choice.vote_count for choice in question_choices)
+            for question_choices in questions
+        ]
+        num_ballots = max(answer_counts, default=0)
+
+        spread = datetime.timedelta(days=self.options["days"]).total_seconds()
+        adapt = connection.ops.adapt_datetimefield_value
+        times = [
+            adapt(self.now - datetime.timedelta(seconds=self.random.uniform(0, spread)))
+            for _ in range(num_ballots)
+        ]
+        first_id = (Ballot.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        self.insert(
+            Ballot,
+            ("id", "poll", "created_at"),
+            ((first_id + index, poll.id, time) for index, time in enumerate(times)),
+        )
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Ballot]):
+                cursor.execute(sql)
+
+        def rows():
+            for question_choices, count in zip(questions, answer_counts):
+                answers = [
+                    choice.id
+                    for choice in question_choices
+                    for _ in range(choice.vote_count)
+                ]
+                self.random.shuffle(answers)
+                ballots = self.random.sample(range(num_ballots), count)
+                for choice_id, ballot in zip(answers, ballots):
+                    yield choice_id, first_id + ballot, times[ballot]
+
+        return num_ballots, self.insert(
+            Answer, ("choice", "ballot", "created_at"), rows()
+        )
+
+    def insert(self, model, fields, rows):
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ", ".join(
+            connection.ops.quote_name(model._meta.get_field(name).column)
+            for name in fields
+        )
+        values = ", ".join(["%s"] * len(fields))
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({values})"
 
-        self.stdout.write(self.style.SUCCESS("Sample data created successfully."))
+        created = 0
+        for batch in batches(rows, self.options["batch_size"]):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            created += len(batch)
+        return created
@@ -0,0 +1,31 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from polls.idempotency import expire_submissions
+
+
+# Deletes stored vote submission responses past their ttl, meant to run periodically.
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys of vote submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl",
+            type=float,
+            help="Keep submissions this many seconds, POLLS_IDEMPOTENCY_TTL by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of submissions deleted per query.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Expiring vote submissions...")
+        ttl = None
+        if options["ttl"] is not None:
+            ttl = datetime.timedelta(seconds=options["ttl"])
+        deleted = expire_submissions(ttl=ttl, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} submissions."))
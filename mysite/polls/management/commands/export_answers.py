@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.export import (
+    FORMATS,
+    ExportUnavailable,
+    answer_rows,
+    csv_chunks,
+    parquet_chunks,
+)
+from polls.structure import get_poll_structure
+
+
+# Writes the answers of a poll as CSV or parquet with constant memory. Exports are
+# resumed from the last exported answer id with --after: CSV is then appended to
+# the output file, parquet is written to a new file.
+class Command(BaseCommand):
+    help = "Export the answers of a poll to CSV or parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("poll_id", type=int)
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument(
+            "--output", help="File to write, standard output for CSV by default."
+        )
+        parser.add_argument(
+            "--after",
+            type=int,
+            default=0,
+            help="Only export answers with a higher id, to resume an export.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Answers fetched from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        if get_poll_structure(options["poll_id"]) is None:
+            raise CommandError(f"Poll {options['poll_id']} not found")
+        binary = options["format"] != "csv"
+        if binary and not options["output"]:
+            raise CommandError(f"{options['format']} exports need --output")
+
+        last_id = options["after"]
+        count = 0
+
+        def rows():
+            nonlocal last_id, count
+            for row in answer_rows(
+                options["poll_id"], options["after"], options["chunk_size"]
+            ):
+                last_id = row[0]
+                count += 1
+                yield row
+
+        try:
+            if binary:
+                chunks = parquet_chunks(rows())
+            else:
+                chunks = csv_chunks(rows(), header=not options["after"])
+        except ExportUnavailable as error:
+            raise CommandError(error)
+
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+        elif binary:
+            with open(options["output"], "wb") as file:
+                file.writelines(chunks)
+        else:
+            mode = "a" if options["after"] else "w"
+            with open(options["output"], mode, newline="") as file:
+                file.writelines(chunks)
+
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Exported {count} answers, resume with --after {last_id}."
+            )
+        )
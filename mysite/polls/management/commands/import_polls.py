@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.importing import InvalidImport, import_polls, parse_file
+
+
+# Creates polls with their questions and choices from a JSON or CSV file, see
+# polls.importing for the formats. The whole file is validated first and imported
+# in one transaction, so an invalid file creates nothing.
+class Command(BaseCommand):
+    help = "Import polls, questions and choices from a JSON or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, - for standard input.")
+        parser.add_argument(
+            "--format",
+            choices=["json", "csv"],
+            help="Format of the file, guessed from its extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows per insert."
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"]
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lower()
+            file_format = "csv" if extension == ".csv" else "json"
+
+        start = time.perf_counter()
+        try:
+            if path == "-":
+                polls = parse_file(sys.stdin, file_format)
+            else:
+                with open(path, newline="", encoding="utf-8") as file:
+                    polls = parse_file(file, file_format)
+        except OSError as error:
+            raise CommandError(error)
+        except InvalidImport as error:
+            raise CommandError("Nothing imported:\n" + "\n".join(error.errors))
+        parsed = time.perf_counter()
+
+        poll_ids = import_polls(polls, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - start
+
+        questions = sum(len(poll.questions) for poll in polls)
+        choices = sum(
+            len(question.choices) for poll in polls for question in poll.questions
+        )
+        rows = len(poll_ids) + questions + choices
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {len(poll_ids)} polls, {questions} questions and "
+                f"{choices} choices in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s, "
+                f"{parsed - start:.2f}s validating)."
+            )
+        )
+        if poll_ids:
+            self.stdout.write(f"First poll id {poll_ids[0]}, last {poll_ids[-1]}.")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from polls.counters import reconcile_votes
+
+
+# Recomputes the denormalized vote counters from live and archived answers.
+class Command(BaseCommand):
+    help = "Recompute choice vote counters from answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll",
+            type=int,
+            nargs="+",
+            dest="poll_ids",
+            help="Only reconcile choices of given poll ids.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconciling vote counters...")
+        updated = reconcile_votes(options["poll_ids"])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} choices."))
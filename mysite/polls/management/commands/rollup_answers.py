@@ -0,0 +1,33 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from polls.rollups import roll_up_answers
+
+
+# Incrementally folds new answers into per minute/hour/day rollups, meant to run
+# periodically (e.g. from cron).
+class Command(BaseCommand):
+    help = "Fold answers newer than the last run into time-bucketed rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100000,
+            help="Answer ids folded per transaction.",
+        )
+        parser.add_argument(
+            "--lag",
+            type=int,
+            default=10,
+            help="Seconds answers must age before being folded.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rolling up answers...")
+        folded = roll_up_answers(
+            batch_size=options["batch_size"],
+            lag=datetime.timedelta(seconds=options["lag"]),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} answers."))
@@ -0,0 +1,143 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+from polls.caching import cache_stats
+from polls.limits import rejection_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# Cumulative histogram in Prometheus style, one per metric and view.
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+METRICS = {
+    "polls_request_duration_seconds": ("Request latency per view.", LATENCY_BUCKETS),
+    "polls_request_queries": ("SQL queries per request per view.", QUERY_BUCKETS),
+    "polls_request_sql_seconds": ("SQL time per request per view.", LATENCY_BUCKETS),
+}
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def observe_request(view, duration, queries, sql_time):
+    with _lock:
+        for metric, value in zip(METRICS, (duration, queries, sql_time)):
+            key = (metric, view)
+            if key not in _histograms:
+                _histograms[key] = Histogram(METRICS[metric][1])
+            _histograms[key].observe(value)
+
+
+def reset_metrics():
+    with _lock:
+        _histograms.clear()
+
+
+# Metrics of this process in the Prometheus text exposition format.
+def render_metrics():
+    lines = []
+    with _lock:
+        for metric, (description, _) in METRICS.items():
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} histogram")
+            for (name, view), histogram in sorted(_histograms.items()):
+                if name != metric:
+                    continue
+                for bound, count in histogram.samples():
+                    lines.append(
+                        f'{metric}_bucket{{view="{view}",le="{bound}"}} {count}'
+                    )
+                lines.append(f'{metric}_sum{{view="{view}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{view="{view}"}} {histogram.count}')
+
+    stats = cache_stats()
+    for event in ("hits", "misses", "invalidations"):
+        lines.append(f"# TYPE polls_page_cache_{event}_total counter")
+        lines.append(f"polls_page_cache_{event}_total {stats[event]}")
+
+    lines.append("# HELP polls_vote_rejections_total Vote requests rejected by limits.")
+    lines.append("# TYPE polls_vote_rejections_total counter")
+    for reason, count in rejection_stats().items():
+        lines.append(f'polls_vote_rejections_total{{reason="{reason}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+# Records latency, SQL query count and SQL time of every request by view name.
+# Streamed responses are observed once their content is consumed, including the
+# queries run while streaming. Async streams are observed when the view returns.
+class QueryMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def measure(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - start
+
+        def observe():
+            match = request.resolver_match
+            view = match.view_name if match else "unresolved"
+            duration = time.perf_counter() - start
+            observe_request(view, duration, queries[0], queries[1])
+
+        start = time.perf_counter()
+        with _measuring(measure):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = _measured(
+                response.streaming_content, measure, observe
+            )
+        else:
+            observe()
+        return response
+
+
+@contextmanager
+def _measuring(measure):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(measure))
+        yield
+
+
+def _measured(chunks, measure, observe):
+    chunks = iter(chunks)
+    try:
+        while True:
+            with _measuring(measure):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        observe()
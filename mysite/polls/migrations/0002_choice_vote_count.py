@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_vote_count(apps, schema_editor):
+    Answer = apps.get_model("polls", "Answer")
+    Choice = apps.get_model("polls", "Choice")
+    answer_count = (
+        Answer.objects.filter(choice=OuterRef("pk"))
+        .order_by()
+        .values("choice")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Choice.objects.update(vote_count=Coalesce(Subquery(answer_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_vote_count, migrations.RunPython.noop),
+    ]
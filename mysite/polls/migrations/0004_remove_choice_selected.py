@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_vote_counter_shard'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='choice',
+            name='selected',
+        ),
+    ]
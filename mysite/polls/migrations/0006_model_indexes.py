@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.fields.related
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0005_answer_rollups"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="answer",
+            name="choice",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.fields.related.ForeignKey,
+                related_name="answers",
+                to="polls.choice",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="choice",
+            name="question",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="choices",
+                to="polls.question",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="question",
+            name="poll",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="questions",
+                to="polls.poll",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["created_at"], name="polls_answe_created_237d19_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["choice", "created_at"], name="answer_choice_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="choice",
+            index=models.Index(
+                fields=["choice_text"], name="polls_choic_choice__456eec_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="choice",
+            index=models.Index(
+                fields=["question", "id"], name="choice_question_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="poll",
+            index=models.Index(
+                fields=["created_at", "poll_name"], name="polls_poll_created_360a54_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["pub_date", "question_text"],
+                name="polls_quest_pub_dat_edd570_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(fields=["poll", "id"], name="question_poll_id_idx"),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0006_model_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="poll",
+            index=models.Index(fields=["created_at", "id"], name="poll_created_id_idx"),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0007_poll_created_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VoteSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=255)),
+                ("status_code", models.PositiveSmallIntegerField()),
+                ("response", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "poll",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="polls.poll",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="votesubmission",
+            constraint=models.UniqueConstraint(
+                fields=("poll", "key"), name="unique_vote_submission_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0008_vote_submission"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedAnswer",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "choice",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_answers",
+                        to="polls.choice",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0009_archived_answer"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="answer",
+            name="choice",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="answers",
+                to="polls.choice",
+            ),
+        ),
+    ]
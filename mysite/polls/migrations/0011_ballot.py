@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0010_answer_choice_cascade"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Ballot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="ballot",
+            name="poll",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="ballots",
+                to="polls.poll",
+            ),
+        ),
+        migrations.AddField(
+            model_name="answer",
+            name="ballot",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="answers",
+                to="polls.ballot",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedanswer",
+            name="ballot",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_answers",
+                to="polls.ballot",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["ballot", "choice"], name="answer_ballot_choice_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedanswer",
+            index=models.Index(
+                fields=["ballot", "choice"], name="archived_ballot_choice_idx"
+            ),
+        ),
+    ]
@@ -9,9 +9,12 @@ class Poll(models.Model):
     poll_name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    indexes = [
-        models.Index(fields=["create_at","poll_name"]),
-    ]
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "poll_name"]),
+            # Keyset pagination of the index.
+            models.Index(fields=["created_at", "id"], name="poll_created_id_idx"),
+        ]
 
     def __str__(self):
         return self.poll_name
@@ -20,15 +23,20 @@ class Poll(models.Model):
 class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField("date published")
-    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name="questions")
+    # Indexed together with id below.
+    poll = models.ForeignKey(
+        Poll, on_delete=models.CASCADE, related_name="questions", db_index=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["pub_date", "question_text"]),
+            models.Index(fields=["poll", "id"], name="question_poll_id_idx"),
+        ]
 
     def __str__(self):
         return self.question_text
 
-    indexes = [
-        models.Index(fields=["pub_date","question_text"]),
-    ]
-
     @admin.display(
         boolean=True,
         ordering="pub_date",
@@ -40,40 +48,163 @@ class Question(models.Model):
 
 
 class Choice(models.Model):
+    # Indexed together with id below.
     question = models.ForeignKey(
-        Question, on_delete=models.CASCADE, related_name="choices"
+        Question, on_delete=models.CASCADE, related_name="choices", db_index=False
     )
     choice_text = models.CharField(max_length=250)
-    selected = models.BooleanField(default=False)
+    # Compacted tally of answers, pending votes live in counter shards.
+    vote_count = models.IntegerField(default=0)
 
-    indexes = [
-        models.Index(fields=["choice_text"]),
-    ]
+    class Meta:
+        indexes = [
+            models.Index(fields=["choice_text"]),
+            models.Index(fields=["question", "id"], name="choice_question_id_idx"),
+        ]
 
     def __str__(self):
         return self.choice_text
 
-    def selected_true(self):
-        self.selected = True
-        self.save()
-        return self
 
-    def selected_false(self):
-        self.selected = False
-        self.save()
-        return self
+# One of several counter rows per choice, spreading concurrent votes across rows.
+class VoteCounterShard(models.Model):
+    choice = models.ForeignKey(
+        Choice, on_delete=models.CASCADE, related_name="counter_shards"
+    )
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["choice", "shard"], name="unique_choice_shard"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.choice} #{self.shard}: {self.count}"
+
+
+# Answers saved together by one vote, linking the choices a voter made across the
+# questions of a poll.
+class Ballot(models.Model):
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name="ballots")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.poll_id} #{self.id}"
 
 
 class Answer(models.Model):
-    choice = models.ForeignKey("Choice", models.ForeignKey, related_name="answers")
+    # Indexed together with created_at below.
+    choice = models.ForeignKey(
+        "Choice", models.CASCADE, related_name="answers", db_index=False
+    )
+    # Empty for answers saved before ballots were recorded. Indexed together with
+    # choice below.
+    ballot = models.ForeignKey(
+        Ballot,
+        models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="answers",
+        db_index=False,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         get_latest_by = "created_at"
+        indexes = [
+            models.Index(fields=["created_at"]),
+            models.Index(
+                fields=["choice", "created_at"], name="answer_choice_created_idx"
+            ),
+            # Covers the ballot analytics, which read answers ballot by ballot.
+            models.Index(fields=["ballot", "choice"], name="answer_ballot_choice_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.choice}"
 
-    indexes = [
-        models.Index(fields=["created_at"]),
-    ]
+
+# Answers moved out of the answer table by the archive_answers command, with their
+# original ids. They stay counted in their choices' vote counters.
+class ArchivedAnswer(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    choice = models.ForeignKey(
+        Choice, on_delete=models.CASCADE, related_name="archived_answers"
+    )
+    ballot = models.ForeignKey(
+        Ballot,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="archived_answers",
+        db_index=False,
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["ballot", "choice"], name="archived_ballot_choice_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.choice}"
+
+
+# Number of answers a choice got per minute, hour or day.
+class AnswerRollup(models.Model):
+    GRANULARITIES = ["minute", "hour", "day"]
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name="rollups")
+    granularity = models.CharField(
+        max_length=6, choices=[(name, name) for name in GRANULARITIES]
+    )
+    bucket = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["choice", "granularity", "bucket"], name="unique_rollup_bucket"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.choice} {self.granularity} {self.bucket}: {self.count}"
+
+
+# Last answer id already folded into the rollups.
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_answer_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_answer_id}"
+
+
+# Response of a vote submission, replayed when a client retries the submission
+# with the same Idempotency-Key header.
+class VoteSubmission(models.Model):
+    # Indexed by the unique constraint below.
+    poll = models.ForeignKey(
+        Poll, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+    key = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["poll", "key"], name="unique_vote_submission_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.poll_id} {self.key}: {self.status_code}"
@@ -0,0 +1,82 @@
+import base64
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Cursors are the (created_at, id) position of the last poll of a page.
+def encode_cursor(poll):
+    position = f"{poll.created_at.isoformat()}|{poll.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, poll_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        created_at = parse_datetime(created_at)
+        poll_id = int(poll_id)
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if created_at is None:
+        raise InvalidCursor(cursor)
+    return created_at, poll_id
+
+
+# Keyset pagination over polls, newest first. Each page is a range read on the
+# (created_at, id) index after the cursor, so its cost doesn't depend on how deep
+# into the list it is. Returns the polls of the page and the cursor of the next.
+def poll_page(queryset, cursor=None, size=None):
+    size = size or settings.POLLS_INDEX_PAGE_SIZE
+    if cursor:
+        created_at, poll_id = decode_cursor(cursor)
+        queryset = queryset.filter(created_at__lte=created_at).exclude(
+            created_at=created_at, id__gte=poll_id
+        )
+
+    polls = list(queryset.order_by("-created_at", "-id")[: size + 1])
+    next_cursor = encode_cursor(polls[size - 1]) if len(polls) > size else None
+    return polls[:size], next_cursor
+
+
+# Row estimate of a model's table, None when the database keeps no cheap one.
+# PostgreSQL's planner statistics are used there, on SQLite the id range of the
+# table is read from the primary key. The range still spans deleted and archived
+# rows, so on SQLite the estimate is an upper bound that grows with the gaps.
+def estimate_count(model):
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == "sqlite":
+        ids = model._default_manager.aggregate(first=Min("pk"), last=Max("pk"))
+        return 0 if ids["first"] is None else ids["last"] - ids["first"] + 1
+    return None
+
+
+# Paginator of admin changelists over huge tables. Unfiltered lists use the
+# estimated row count of the table instead of counting every row. An estimate
+# above the real count, as on SQLite once answers were archived, only adds empty
+# pages at the end of the list, earlier pages hold the same rows either way.
+class EstimatedCountPaginator(Paginator):
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimate_count(self.object_list.model)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return super().count
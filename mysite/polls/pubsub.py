@@ -0,0 +1,152 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+
+# In-process pub/sub telling streaming viewers that a poll's tallies changed.
+# Each subscriber owns an asyncio.Event, so a burst of votes published before the
+# subscriber wakes up collapses into a single notification.
+class PollUpdates:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, poll_id):
+        subscription = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers[poll_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, poll_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(poll_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[poll_id]
+
+    # Safe to call from any thread, e.g. the sync vote views.
+    def publish(self, poll_id):
+        with self._lock:
+            subscribers = list(self._subscribers.get(poll_id, ()))
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop of a disconnected viewer is already closed.
+                pass
+
+
+# Waiting for an event of a channel, raising the error its task failed with.
+async def _wait(channel, event):
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        await asyncio.wait([waiter, channel.task], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+    if not event.is_set():
+        channel.task.result()
+
+
+# A viewer of a poll's tallies, entered as an async context manager. "tallies"
+# holds the current tallies once entered, next_changes() returns the changes since
+# the viewer last looked, merged into one when it falls behind.
+class TallyListener:
+    def __init__(self, broadcaster, poll_id):
+        self.broadcaster = broadcaster
+        self.poll_id = poll_id
+        self.tallies = None
+        self.changes = {}
+        self.changed = asyncio.Event()
+
+    async def __aenter__(self):
+        self.channel = self.broadcaster._join(self)
+        try:
+            await _wait(self.channel, self.channel.ready)
+        except BaseException:
+            self.broadcaster._leave(self)
+            raise
+        self.tallies = dict(self.channel.tallies)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broadcaster._leave(self)
+
+    async def next_changes(self):
+        await _wait(self.channel, self.changed)
+        self.changed.clear()
+        changes, self.changes = self.changes, {}
+        return changes
+
+
+class _Channel:
+    def __init__(self, key, subscription):
+        self.key = key
+        self.subscription = subscription
+        self.listeners = set()
+        self.tallies = None
+        self.ready = asyncio.Event()
+        self.task = None
+
+
+# Tallies of polls shared by every viewer of a poll on one event loop. One task per
+# poll and loop waits for its updates, reads the tallies with "read_tallies" at most
+# once per POLLS_STREAM_INTERVAL seconds and hands the changes to every viewer, so
+# the database load of a poll doesn't grow with its number of viewers.
+class TallyBroadcaster:
+    def __init__(self, updates, read_tallies):
+        self.updates = updates
+        self.read_tallies = read_tallies
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def listen(self, poll_id):
+        return TallyListener(self, poll_id)
+
+    def _join(self, listener):
+        key = (asyncio.get_running_loop(), listener.poll_id)
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                # Subscribing before the first read, so no vote goes unnoticed.
+                channel = _Channel(key, self.updates.subscribe(listener.poll_id))
+                self._channels[key] = channel
+                channel.task = asyncio.create_task(
+                    self._broadcast(listener.poll_id, channel)
+                )
+            channel.listeners.add(listener)
+        return channel
+
+    def _leave(self, listener):
+        channel = listener.channel
+        with self._lock:
+            channel.listeners.discard(listener)
+            if not channel.listeners and self._channels.get(channel.key) is channel:
+                del self._channels[channel.key]
+                channel.task.cancel()
+                self.updates.unsubscribe(listener.poll_id, channel.subscription)
+
+    async def _broadcast(self, poll_id, channel):
+        _, updated = channel.subscription
+        channel.tallies = await self.read_tallies(poll_id)
+        channel.ready.set()
+        while True:
+            await updated.wait()
+            updated.clear()
+            latest = await self.read_tallies(poll_id)
+            changes = {
+                choice_id: total
+                for choice_id, total in latest.items()
+                if channel.tallies.get(choice_id) != total
+            }
+            channel.tallies = latest
+            if changes:
+                for listener in list(channel.listeners):
+                    listener.changes.update(changes)
+                    listener.changed.set()
+            await asyncio.sleep(settings.POLLS_STREAM_INTERVAL)
+
+
+poll_updates = PollUpdates()
@@ -0,0 +1,69 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from polls.models import Answer, AnswerRollup, RollupWatermark
+
+WATERMARK = "answer_rollups"
+
+
+# Adding answers with ids in (first_id, last_id] to the rollups of every
+# granularity, returns the number of folded answers.
+def _fold(first_id, last_id):
+    answers = Answer.objects.filter(id__gt=first_id, id__lte=last_id).order_by()
+    folded = 0
+
+    for granularity in AnswerRollup.GRANULARITIES:
+        counts = {
+            (row["choice_id"], row["bucket"]): row["total"]
+            for row in answers.annotate(bucket=Trunc("created_at", granularity))
+            .values("choice_id", "bucket")
+            .annotate(total=Count("id"))
+        }
+        folded = sum(counts.values())
+        existing = AnswerRollup.objects.filter(
+            granularity=granularity,
+            choice_id__in={choice_id for choice_id, _ in counts},
+            bucket__in={bucket for _, bucket in counts},
+        )
+
+        updated = []
+        for rollup in existing:
+            total = counts.pop((rollup.choice_id, rollup.bucket), None)
+            if total is not None:
+                rollup.count += total
+                updated.append(rollup)
+        AnswerRollup.objects.bulk_update(updated, ["count"])
+        AnswerRollup.objects.bulk_create(
+            AnswerRollup(
+                choice_id=choice_id, granularity=granularity, bucket=bucket, count=total
+            )
+            for (choice_id, bucket), total in counts.items()
+        )
+    return folded
+
+
+# Folding answers newer than the watermark into the rollups, batch_size answer ids
+# per transaction. Runs stop at the last answer older than "lag", so rows of
+# transactions still in flight can't slip below the watermark.
+def roll_up_answers(batch_size=100000, lag=datetime.timedelta(seconds=10)):
+    watermark = RollupWatermark.objects.get_or_create(name=WATERMARK)[0]
+    last_id = Answer.objects.filter(
+        id__gt=watermark.last_answer_id, created_at__lte=timezone.now() - lag
+    ).aggregate(last_id=Max("id"))["last_id"]
+    folded = 0
+
+    while last_id is not None:
+        with transaction.atomic():
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+            if watermark.last_answer_id >= last_id:
+                return folded
+
+            batch_end = min(watermark.last_answer_id + batch_size, last_id)
+            folded += _fold(watermark.last_answer_id, batch_end)
+            watermark.last_answer_id = batch_end
+            watermark.save()
+    return folded
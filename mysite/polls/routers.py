@@ -0,0 +1,95 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+
+PRIMARY_COOKIE = "polls_primary_until"
+
+_replica_reads = ContextVar("polls_replica_reads", default=False)
+
+
+# Sends reads of polls models to a random alias of POLLS_READ_REPLICAS while a view
+# decorated with replica_reads runs, everything else to the default database.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.POLLS_READ_REPLICAS
+        if replicas and _replica_reads.get() and model._meta.app_label == "polls":
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.POLLS_READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# Whether a client wrote recently enough that replicas may not have its writes yet.
+# A cookie rather than the session, so checking it costs no query. Forging it only
+# sends the client's reads to the primary.
+def reads_primary(request):
+    try:
+        return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# Sending the reads of a client to the primary for POLLS_REPLICA_LAG seconds after
+# it voted, so it sees its own vote.
+def pin_primary(response):
+    if settings.POLLS_READ_REPLICAS:
+        lag = settings.POLLS_REPLICA_LAG
+        response.set_cookie(
+            PRIMARY_COOKIE, str(time.time() + lag), max_age=lag, samesite="Lax"
+        )
+    return response
+
+
+# Routing polls reads of the block to the replicas.
+@contextmanager
+def reading_replicas():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _on_replicas(chunks):
+    chunks = iter(chunks)
+    while True:
+        with reading_replicas():
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+# Running a view with its polls reads on replicas, unless the client is pinned to
+# the primary. Lazy templates are rendered and streamed content is read on the
+# replicas too. Replica pages may miss the latest votes, so they are cached for at
+# most POLLS_REPLICA_LAG seconds.
+def replica_reads(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.POLLS_READ_REPLICAS or reads_primary(request):
+            return view(request, *args, **kwargs)
+
+        with reading_replicas():
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+        if response.streaming:
+            response.streaming_content = _on_replicas(response.streaming_content)
+        elif response.status_code == 200:
+            patch_cache_control(response, max_age=settings.POLLS_REPLICA_LAG)
+        return response
+
+    return wrapper
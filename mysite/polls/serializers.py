@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Question, Choice, Answer, Poll
+from .models import Answer, AnswerRollup, Poll
 
 
 class AnswerSerializer(serializers.ModelSerializer):
@@ -8,29 +8,17 @@ class AnswerSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-# Serializers with relationships.
-class ChoiceSerializer(serializers.ModelSerializer):
-    num_answers = serializers.SerializerMethodField()
-
-    def get_num_answers(self, choice):
-        return choice.answers.count()
-
-    class Meta:
-        model = Choice
-        fields = ("id", "choice_text", "num_answers")
-
-
-class QuestionSerializer(serializers.ModelSerializer):
-    choices = ChoiceSerializer(many=True)
-
+class AnswerRollupSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Question
-        fields = ("id", "question_text", "pub_date", "choices")
+        model = AnswerRollup
+        fields = ("choice", "bucket", "count")
 
 
-class PollDetailSerializer(serializers.ModelSerializer):
-    questions = QuestionSerializer(many=True)
+# Polls annotated with annotate_poll_totals.
+class PollListSerializer(serializers.ModelSerializer):
+    question_count = serializers.IntegerField(read_only=True)
+    answer_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Poll
-        fields = ("id", "poll_name", "created_at", "questions")
+        fields = ("id", "poll_name", "created_at", "question_count", "answer_count")
@@ -1,12 +1,93 @@
-from django.core.cache import cache
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from polls.models import Answer
+from polls.caching import invalidate_polls
+from polls.counters import decrement_votes, increment_votes
+from polls.models import Answer, Choice, Poll, Question
+from polls.pubsub import poll_updates
+from polls.structure import invalidate_poll_structure
 
 
 # Singnal that will be executed when answer is deleted or updated.
 @receiver(post_save, sender=Answer)
 @receiver(post_delete, sender=Answer)
 def clear_cache(sender, instance, **kwargs):
-    cache.clear()
+    poll_ids = Question.objects.filter(choices=instance.choice_id).values_list(
+        "poll_id", flat=True
+    )
+    for poll_id in poll_ids:
+        invalidate_polls(poll_id)
+        transaction.on_commit(lambda poll_id=poll_id: poll_updates.publish(poll_id))
+
+
+# Keeping the choice vote counters in sync with saved or deleted answers.
+@receiver(post_save, sender=Answer)
+def count_vote(sender, instance, created, **kwargs):
+    if created:
+        increment_votes([instance.choice_id])
+
+
+# Answers deleted along with their choice take the counters with them.
+@receiver(post_delete, sender=Answer)
+def uncount_vote(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Answer) or getattr(origin, "model", None) is Answer:
+        decrement_votes([instance.choice_id])
+
+
+# Polls of saved or deleted questions and choices, as stored in the database.
+def _poll_ids(sender, pk):
+    if sender is Question:
+        return set(Question.objects.filter(id=pk).values_list("poll_id", flat=True))
+    return set(Question.objects.filter(choices=pk).values_list("poll_id", flat=True))
+
+
+# Remembering the poll a question or choice belonged to before it is saved, so
+# moving it to another poll drops the structure of both.
+@receiver(pre_save, sender=Question)
+@receiver(pre_save, sender=Choice)
+def remember_poll(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._previous_poll_ids = _poll_ids(sender, instance.pk)
+
+
+# Dropping the cached structure and pages of a poll whose questions or choices changed.
+@receiver(post_save, sender=Poll)
+@receiver(post_delete, sender=Poll)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def clear_poll_structure(sender, instance, **kwargs):
+    if sender is Poll:
+        poll_ids = {instance.id}
+    elif sender is Question:
+        poll_ids = {instance.poll_id}
+    else:
+        poll_ids = set(
+            Question.objects.filter(id=instance.question_id).values_list(
+                "poll_id", flat=True
+            )
+        )
+    poll_ids |= getattr(instance, "_previous_poll_ids", set())
+
+    for poll_id in poll_ids:
+        invalidate_poll_structure(poll_id)
+        invalidate_polls(poll_id)
+
+
+# Configuring every new SQLite connection. WAL mode sticks to the database file,
+# busy timeout and sync level only last for the connection.
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA busy_timeout = {settings.POLLS_SQLITE_BUSY_TIMEOUT}")
+        if settings.POLLS_SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            # Durable across crashes of the process, only a power loss can lose
+            # the latest commits in WAL mode.
+            cursor.execute("PRAGMA synchronous = NORMAL")
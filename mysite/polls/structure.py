@@ -0,0 +1,108 @@
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+from polls.models import Poll, Question
+
+STRUCTURE_TIMEOUT = 60 * 60 * 24
+
+
+class ChoiceItem(NamedTuple):
+    id: int
+    choice_text: str
+
+
+class QuestionItem(NamedTuple):
+    id: int
+    question_text: str
+    choices: tuple
+
+
+# Questions and choices of a poll, enough to render its form and validate ballots
+# without queries. choice_questions maps every choice id to its question id.
+class PollStructure(NamedTuple):
+    id: int
+    poll_name: str
+    questions: tuple
+    choice_questions: dict
+
+    def __str__(self):
+        return self.poll_name
+
+
+# Read on the primary database: the structure is cached for a day and validates
+# ballots, so it must not come from a lagging replica.
+def load_poll_structure(poll_id):
+    poll_name = (
+        Poll.objects.using("default")
+        .filter(pk=poll_id)
+        .values_list("poll_name", flat=True)
+        .first()
+    )
+    if poll_name is None:
+        return None
+
+    questions = {}
+    for question_id, question_text, choice_id, choice_text in (
+        Question.objects.using("default")
+        .filter(poll_id=poll_id)
+        .order_by("id", "choices__id")
+        .values_list("id", "question_text", "choices__id", "choices__choice_text")
+    ):
+        choices = questions.setdefault((question_id, question_text), [])
+        if choice_id is not None:
+            choices.append(ChoiceItem(choice_id, choice_text))
+
+    return PollStructure(
+        id=poll_id,
+        poll_name=poll_name,
+        questions=tuple(
+            QuestionItem(question_id, question_text, tuple(choices))
+            for (question_id, question_text), choices in questions.items()
+        ),
+        choice_questions={
+            choice.id: question_id
+            for (question_id, _), choices in questions.items()
+            for choice in choices
+        },
+    )
+
+
+def _structure_key(poll_id):
+    return f"polls:structure:{poll_id}"
+
+
+# Cached structure of a poll, None when the poll doesn't exist.
+def get_poll_structure(poll_id):
+    structure = cache.get(_structure_key(poll_id))
+    if structure is None:
+        structure = load_poll_structure(poll_id)
+        if structure is not None:
+            cache.set(_structure_key(poll_id), structure, STRUCTURE_TIMEOUT)
+    return structure
+
+
+def invalidate_poll_structure(poll_id):
+    cache.delete(_structure_key(poll_id))
+
+
+# Returning the submitted choice ids of a ballot, or an error message.
+def check_ballot(structure, data):
+    submitted = {}
+    for question_id, choice_id in data.items():
+        if question_id.startswith("choice") and choice_id:
+            try:
+                submitted[int(question_id.replace("choice", ""))] = int(choice_id)
+            except ValueError:
+                return None, "Invalid question or choice"
+    if not submitted:
+        return None, "No valid votes submitted"
+
+    if any(
+        structure.choice_questions.get(choice_id) != question_id
+        for question_id, choice_id in submitted.items()
+    ):
+        return None, "Invalid question or choice"
+    if len(submitted) != len(structure.questions):
+        return None, "Please answer all questions"
+    return list(submitted.values()), None
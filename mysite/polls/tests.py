@@ -1,65 +1,1809 @@
+import asyncio
+import collections
+import csv
 import datetime
-from django.test import TestCase
+import importlib
+import json
+import os
+import tracemalloc
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import addModuleCleanup, mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
 from django.utils import timezone
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Count, F
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from .models import Question
+from . import analytics, export, idempotency, importing, limits, routers, views
+from .archive import archive_answers
+from .caching import cache_stats, get_poll_version
+from .management.commands import benchmark
+from .counters import (
+    annotate_poll_totals,
+    annotate_vote_totals,
+    compact_votes,
+    increment_votes,
+    reconcile_votes,
+)
+from .metrics import Histogram, reset_metrics
+from .models import (
+    Answer,
+    AnswerRollup,
+    ArchivedAnswer,
+    Ballot,
+    Choice,
+    Poll,
+    Question,
+    VoteCounterShard,
+    VoteSubmission,
+)
+from .pagination import EstimatedCountPaginator, encode_cursor
+from .pubsub import PollUpdates, TallyBroadcaster
+from .rollups import roll_up_answers
+from .structure import get_poll_structure
+from .voting import record_answers, record_ballots
+from .writer import AnswerWriter, answer_writer
+
+
+# Most tests vote repeatedly from one client, limits are tested in VoteLimitTests.
+# Replicas configured in the environment are ignored, see ReplicaRouterTests.
+def setUpModule():
+    limits = override_settings(
+        POLLS_VOTE_LIMITER=None,
+        POLLS_ONE_VOTE_PER_SESSION=False,
+        POLLS_READ_REPLICAS=[],
+    )
+    limits.enable()
+    addModuleCleanup(limits.disable)
+
+
+def streamed_json(response):
+    return json.loads(b"".join(response.streaming_content))
 
 
-def create_question(question_text, days):
+# Assertions on the peak memory of consuming streamed content, which should be
+# bounded by its chunk size rather than grow with the data streamed.
+class StreamedMemoryMixin:
+    def peak_memory(self, chunks):
+        tracemalloc.start()
+        try:
+            for _ in chunks:
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # Streams of a small and a large input are made by "small" and "large"; the
+    # large one may peak at most "growth" times as high. The first stream warms up
+    # imports and caches and isn't measured.
+    def assertMemoryBounded(self, small, large, growth):
+        self.peak_memory(small())
+        small_peak = self.peak_memory(small())
+        large_peak = self.peak_memory(large())
+        self.assertLess(large_peak, small_peak * growth)
+
+
+def create_question(question_text, days, poll):
     time = timezone.now() + datetime.timedelta(days=days)
-    return Question.objects.create(question_text=question_text, pub_date=time)
+    return Question.objects.create(
+        question_text=question_text, pub_date=time, poll=poll
+    )
+
+
+def create_poll(num_questions=2, num_choices=3):
+    poll = Poll.objects.create(poll_name="Poll")
+    for question_index in range(num_questions):
+        question = Question.objects.create(
+            question_text=f"Question {question_index}",
+            pub_date=timezone.now(),
+            poll=poll,
+        )
+        for choice_index in range(num_choices):
+            Choice.objects.create(
+                question=question, choice_text=f"Choice {choice_index}"
+            )
+    return poll
+
+
+class QuestionModelTests(TestCase):
+    def test_was_published_recently_with_future_question(self):
+        poll = Poll.objects.create(poll_name="Poll")
+        question = create_question("Future question.", days=30, poll=poll)
+        self.assertIs(question.was_published_recently(), False)
+
+    def test_was_published_recently_with_old_question(self):
+        poll = Poll.objects.create(poll_name="Poll")
+        question = create_question("Past question.", days=-30, poll=poll)
+        self.assertIs(question.was_published_recently(), False)
+
+    def test_was_published_recently_with_recent_question(self):
+        poll = Poll.objects.create(poll_name="Poll")
+        question = create_question("Recent question.", days=0, poll=poll)
+        self.assertIs(question.was_published_recently(), True)
 
 
-class QuestionIndexViewTests(TestCase):
-    def test_no_questions(self):
+class PollIndexViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_no_polls(self):
         response = self.client.get(reverse("polls:index"))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "No polls are available.")
-        self.assertQuerySetEqual(response.context["latest_question_list"], [])
+        self.assertQuerySetEqual(response.context["polls"], [])
 
-    def test_past_question(self):
-        question = create_question(question_text="Past question.", days=-30)
+    def test_polls_are_listed(self):
+        poll = Poll.objects.create(poll_name="Favourite colour")
         response = self.client.get(reverse("polls:index"))
-        self.assertQuerySetEqual(
-            response.context["latest_question_list"],
-            [question],
+        self.assertContains(response, "Favourite colour")
+        self.assertQuerySetEqual(response.context["polls"], [poll])
+
+    def test_polls_are_annotated_with_totals(self):
+        poll = create_poll(num_questions=2)
+        Answer.objects.create(choice=poll.questions.first().choices.first())
+        Choice.objects.filter(question__poll=poll).update(
+            vote_count=F("vote_count") + 2
         )
+        create_poll(num_questions=0)
 
-    def test_future_question(self):
-        create_question(question_text="Future question.", days=30)
-        response = self.client.get(reverse("polls:index"))
-        self.assertContains(response, "No polls are available.")
-        self.assertQuerySetEqual(response.context["latest_question_list"], [])
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("polls:index"))
+        empty, listed = response.context["polls"]
+        self.assertEqual((listed.question_count, listed.answer_count), (2, 13))
+        self.assertEqual((empty.question_count, empty.answer_count), (0, 0))
 
-    def test_future_question_and_past_question(self):
-        question = create_question(question_text="Past question.", days=-30)
-        create_question(question_text="Future question.", days=30)
-        response = self.client.get(reverse("polls:index"))
-        self.assertQuerySetEqual(
-            response.context["latest_question_list"],
-            [question],
+    @override_settings(POLLS_INDEX_PAGE_SIZE=2)
+    def test_cursor_pages_cover_every_poll_once(self):
+        polls = [Poll.objects.create(poll_name=f"Poll {index}") for index in range(5)]
+        # Polls created in the same instant are ordered by id.
+        Poll.objects.filter(id__in=[poll.id for poll in polls[:3]]).update(
+            created_at=polls[0].created_at
         )
 
-    def test_two_past_questions(self):
-        question1 = create_question(question_text="Past question 1.", days=-30)
-        question2 = create_question(question_text="Past question 2.", days=-5)
-        response = self.client.get(reverse("polls:index"))
-        self.assertQuerySetEqual(
-            response.context["latest_question_list"],
-            [question2, question1],
+        seen, cursor = [], ""
+        while True:
+            response = self.client.get(reverse("polls:index"), {"cursor": cursor})
+            seen += [poll.id for poll in response.context["polls"]]
+            cursor = response.context["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [poll.id for poll in reversed(polls)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("polls:index"), {"cursor": "nonsense"})
+        self.assertEqual(response.status_code, 404)
+
+
+class PollListApiTests(TestCase):
+    @override_settings(POLLS_INDEX_PAGE_SIZE=2)
+    def test_pages_follow_next_links(self):
+        polls = [create_poll(num_questions=1) for _ in range(3)]
+        response = self.client.get(reverse("polls:poll_list"))
+        data = response.json()
+        self.assertEqual(
+            [poll["id"] for poll in data["results"]], [polls[2].id, polls[1].id]
+        )
+        self.assertEqual(data["results"][0]["question_count"], 1)
+
+        data = self.client.get(data["next"]).json()
+        self.assertEqual([poll["id"] for poll in data["results"]], [polls[0].id])
+        self.assertIsNone(data["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("polls:poll_list"), {"cursor": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Invalid cursor"})
+
+
+class PollDetailViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_missing_poll(self):
+        response = self.client.get(reverse("polls:detail", args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_questions_and_choices_are_shown(self):
+        poll = Poll.objects.create(poll_name="Poll")
+        question = create_question("Past Question.", days=-5, poll=poll)
+        Choice.objects.create(question=question, choice_text="Yes")
+        response = self.client.get(reverse("polls:detail", args=(poll.id,)))
+        self.assertContains(response, question.question_text)
+        self.assertContains(response, "Yes")
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+    def test_regressions_against_baseline(self):
+        baseline = {
+            "endpoints": {
+                "results": {"wall_ms": 10, "queries": 5, "peak_kb": 100},
+                "vote": {"wall_ms": 10, "queries": 5, "peak_kb": 100},
+            }
+        }
+        report = {
+            "endpoints": {
+                "results": {"wall_ms": 12, "queries": 5, "peak_kb": 100},
+                "vote": {"wall_ms": 20, "queries": 6, "peak_kb": 100},
+                "index": {"wall_ms": 1, "queries": 1, "peak_kb": 10},
+            }
+        }
+        self.assertEqual(
+            benchmark.Command().regressions(report, baseline, tolerance=0.25),
+            ["vote: 6 queries, baseline 5", "vote: wall_ms 20, baseline 10"],
+        )
+
+
+class VoteCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = create_poll()
+        self.choice = Choice.objects.filter(question__poll=self.poll).first()
+
+    def total_votes(self, choice):
+        return (
+            annotate_vote_totals(Choice.objects.filter(id=choice.id)).get().total_votes
+        )
+
+    def test_answer_save_increments_counter(self):
+        Answer.objects.create(choice=self.choice)
+        Answer.objects.create(choice=self.choice)
+        self.assertEqual(self.total_votes(self.choice), 2)
+
+    def test_answer_delete_decrements_counter(self):
+        answer = Answer.objects.create(choice=self.choice)
+        answer.delete()
+        self.assertEqual(self.total_votes(self.choice), 0)
+
+    def test_votes_are_spread_across_shards(self):
+        with self.settings(POLLS_VOTE_COUNTER_SHARDS=4):
+            for _ in range(40):
+                increment_votes([self.choice.id])
+        self.assertGreater(self.choice.counter_shards.count(), 1)
+        self.assertEqual(self.total_votes(self.choice), 40)
+
+    def test_compaction_folds_shards(self):
+        increment_votes([self.choice.id, self.choice.id])
+        compact_votes()
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.vote_count, 2)
+        self.assertFalse(VoteCounterShard.objects.exists())
+        self.assertEqual(self.total_votes(self.choice), 2)
+
+    def test_reconcile_recomputes_from_answers(self):
+        Answer.objects.create(choice=self.choice)
+        Choice.objects.update(vote_count=42)
+        call_command("reconcile_votes", stdout=open(os.devnull, "w"))
+        self.assertEqual(
+            list(Choice.objects.order_by("id").values_list("vote_count", flat=True)),
+            [1, 0, 0, 0, 0, 0],
+        )
+
+    def test_results_api_reads_counters(self):
+        Answer.objects.create(choice=self.choice)
+        response = self.client.get(reverse("polls:poll_data", args=(self.poll.id,)))
+        choices = streamed_json(response)["questions"][0]["choices"]
+        self.assertEqual(choices[0]["num_answers"], 1)
+
+
+class ResultsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_chart_data_is_one_payload(self):
+        poll = create_poll(num_questions=3)
+        choice = poll.questions.last().choices.last()
+        Answer.objects.create(choice=choice)
+        get_poll_structure(poll.id)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("polls:results", args=(poll.id,)))
+        self.assertContains(response, 'id="chart-data"', count=1)
+        self.assertContains(response, "<canvas", count=3)
+        self.assertContains(response, "<li>Choice 2: 1</li>", count=1)
+        self.assertContains(response, "<li>Choice 2: 0</li>", count=2)
+        self.assertEqual(
+            response.context["charts"][-1],
+            {"labels": ["Choice 0", "Choice 1", "Choice 2"], "counts": [0, 0, 1]},
+        )
+
+    def test_missing_poll(self):
+        response = self.client.get(reverse("polls:results", args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class PollDetailApiTests(StreamedMemoryMixin, TestCase):
+    def test_streams_every_question_and_choice(self):
+        poll = create_poll(num_questions=3, num_choices=2)
+        choice = Choice.objects.filter(question__poll=poll).order_by("id").last()
+        Answer.objects.create(choice=choice)
+
+        response = self.client.get(reverse("polls:poll_data", args=(poll.id,)))
+        self.assertTrue(response.streaming)
+        data = streamed_json(response)
+        self.assertEqual(data["id"], poll.id)
+        self.assertEqual(data["poll_name"], "Poll")
+        self.assertEqual(len(data["questions"]), 3)
+        self.assertEqual(
+            [len(question["choices"]) for question in data["questions"]], [2, 2, 2]
+        )
+        self.assertEqual(
+            data["questions"][-1]["choices"][-1],
+            {"id": choice.id, "choice_text": "Choice 1", "num_answers": 1},
+        )
+
+    def test_missing_poll(self):
+        response = self.client.get(reverse("polls:poll_data", args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+    # Streamed documents are not page cached, a new vote shows up right away.
+    def test_is_not_cached(self):
+        poll = create_poll(num_questions=1, num_choices=1)
+        choice = Choice.objects.get(question__poll=poll)
+        url = reverse("polls:poll_data", args=(poll.id,))
+        streamed_json(self.client.get(url))
+
+        Answer.objects.create(choice=choice)
+        with self.assertNumQueries(3):
+            data = streamed_json(self.client.get(url))
+        self.assertEqual(data["questions"][0]["choices"][0]["num_answers"], 1)
+
+    # Peak memory is bounded by the chunk size, not by the size of the poll.
+    def test_memory_does_not_grow_with_poll_size(self):
+        def stream(poll):
+            url = reverse("polls:poll_data", args=(poll.id,))
+            return lambda: self.client.get(url).streaming_content
+
+        small, large = create_poll(num_questions=10), create_poll(num_questions=200)
+        with mock.patch.object(views.PollDetailView, "chunk_size", 20):
+            self.assertMemoryBounded(stream(small), stream(large), growth=1.5)
+
+
+def full_ballot(poll):
+    return {
+        f"choice{question.id}": question.choices.first().id
+        for question in poll.questions.all()
+    }
+
+
+class VoteApiViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_vote_creates_answers(self):
+        poll = create_poll(num_questions=3)
+        url = reverse("polls:vote_api", args=(poll.id,))
+        response = self.client.post(url, full_ballot(poll))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["answers"]), 3)
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_incomplete_vote_is_rejected(self):
+        poll = create_poll(num_questions=3)
+        ballot = full_ballot(poll)
+        ballot.popitem()
+        url = reverse("polls:vote_api", args=(poll.id,))
+        response = self.client.post(url, ballot)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Please answer all questions"})
+        self.assertFalse(Answer.objects.exists())
+
+    def test_retry_with_idempotency_key_replays_response(self):
+        poll = create_poll(num_questions=3)
+        url = reverse("polls:vote_api", args=(poll.id,))
+        headers = {"Idempotency-Key": "ballot-1"}
+        ballot = full_ballot(poll)
+        first = self.client.post(url, ballot, headers=headers)
+
+        with self.assertNumQueries(1):
+            retry = self.client.post(url, ballot, headers=headers)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Answer.objects.count(), 3)
+
+        other = self.client.post(
+            url, full_ballot(poll), headers={"Idempotency-Key": "ballot-2"}
+        )
+        self.assertEqual(other.status_code, 201)
+        self.assertEqual(Answer.objects.count(), 6)
+
+    def test_rejected_vote_does_not_use_up_its_key(self):
+        poll = create_poll(num_questions=3)
+        url = reverse("polls:vote_api", args=(poll.id,))
+        headers = {"Idempotency-Key": "ballot-1"}
+        ballot = full_ballot(poll)
+        self.client.post(url, {"choice0": ballot.popitem()[1]}, headers=headers)
+        response = self.client.post(url, full_ballot(poll), headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_duplicate_key_rolls_back_votes(self):
+        poll = create_poll(num_questions=3)
+        url = reverse("polls:vote_api", args=(poll.id,))
+        # The first submission stores its key between the replay lookup and the
+        # insert of the second one.
+        original = idempotency.stored_response
+        lookups = iter([None])
+
+        def stored_response(poll_id, key):
+            return next(lookups, None) or original(poll_id, key)
+
+        headers = {"Idempotency-Key": "ballot-1"}
+        first = self.client.post(url, full_ballot(poll), headers=headers)
+        with mock.patch.object(idempotency, "stored_response", stored_response):
+            retry = self.client.post(url, full_ballot(poll), headers=headers)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Answer.objects.count(), 3)
+        self.assertEqual(
+            sum(
+                choice.total_votes
+                for choice in annotate_vote_totals(Choice.objects.all())
+            ),
+            3,
         )
 
+    def test_overlong_key_is_rejected(self):
+        poll = create_poll()
+        response = self.client.post(
+            reverse("polls:vote_api", args=(poll.id,)),
+            full_ballot(poll),
+            headers={"Idempotency-Key": "k" * 256},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Answer.objects.exists())
+
+    def test_expire_command_deletes_old_submissions(self):
+        poll = create_poll()
+        url = reverse("polls:vote_api", args=(poll.id,))
+        for key in ("old", "new"):
+            self.client.post(url, full_ballot(poll), headers={"Idempotency-Key": key})
+        VoteSubmission.objects.filter(key="old").update(
+            created_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        call_command("expire_vote_submissions", stdout=open(os.devnull, "w"))
+        self.assertEqual(
+            list(VoteSubmission.objects.values_list("key", flat=True)), ["new"]
+        )
+
+    def test_choice_of_other_question_is_rejected(self):
+        poll = create_poll(num_questions=2)
+        first, second = poll.questions.all()
+        ballot = {
+            f"choice{first.id}": second.choices.first().id,
+            f"choice{second.id}": second.choices.first().id,
+        }
+        url = reverse("polls:vote_api", args=(poll.id,))
+        response = self.client.post(url, ballot)
+        self.assertEqual(response.json(), {"error": "Invalid question or choice"})
+        self.assertFalse(Answer.objects.exists())
+
+    def test_empty_vote_is_rejected(self):
+        poll = create_poll()
+        url = reverse("polls:vote_api", args=(poll.id,))
+        response = self.client.post(url, {})
+        self.assertEqual(response.json(), {"error": "No valid votes submitted"})
+
+    def test_query_count_does_not_depend_on_question_count(self):
+        small, large = create_poll(num_questions=2), create_poll(num_questions=50)
+        counts = []
+        for poll in (small, large):
+            ballot = full_ballot(poll)
+            url = reverse("polls:vote_api", args=(poll.id,))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, ballot)
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class VoteViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_vote_redirects_to_results(self):
+        poll = create_poll(num_questions=3)
+        response = self.client.post(
+            reverse("polls:vote", args=(poll.id,)), full_ballot(poll)
+        )
+        self.assertRedirects(response, reverse("polls:results", args=(poll.id,)))
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_incomplete_vote_keeps_selection(self):
+        poll = create_poll(num_questions=2)
+        first, second = poll.questions.all()
+        selected = first.choices.last()
+        response = self.client.post(
+            reverse("polls:vote", args=(poll.id,)), {f"choice{first.id}": selected.id}
+        )
+        self.assertEqual(
+            response.context["error_message"], "You didn't select a choice."
+        )
+        self.assertEqual(
+            [question.id for question in response.context["missing_questions"]],
+            [second.id],
+        )
+        self.assertContains(response, f'value="{selected.id}" checked')
+        self.assertFalse(Answer.objects.exists())
+
+    @override_settings(POLLS_VOTE_COUNTER_SHARDS=1)
+    def test_vote_query_count_is_constant(self):
+        for num_questions in (2, 50):
+            poll = create_poll(num_questions=num_questions)
+            ballot = full_ballot(poll)
+            url = reverse("polls:vote", args=(poll.id,))
+            # First vote caches the poll structure and creates the counter shards,
+            # later ones only insert the ballot and its answers and update the shards.
+            self.client.post(url, ballot)
+            with self.assertNumQueries(7):
+                self.client.post(url, ballot)
+
+
+class PollCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_vote_only_invalidates_its_poll(self):
+        voted, other = create_poll(), create_poll()
+        for poll in (voted, other):
+            self.client.get(reverse("polls:results", args=(poll.id,)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("polls:vote_api", args=(voted.id,)), full_ballot(voted)
+            )
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse("polls:results", args=(other.id,)))
+        response = self.client.get(reverse("polls:results", args=(voted.id,)))
+        self.assertEqual(response.context["charts"][0]["counts"][0], 1)
 
-class QuestionDetailViewTests(TestCase):
-    def test_future_question(self):
-        future_question = create_question(question_text="Future question.", days=5)
-        url = reverse("polls:detail", args=(future_question.id,))
+    # Pages rendered while the votes aren't committed yet must not be cached under
+    # the version that follows the votes.
+    def test_votes_invalidate_once_committed(self):
+        poll = create_poll()
+        url = reverse("polls:results", args=(poll.id,))
+        version = get_poll_version(poll.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            record_answers(poll.id, list(full_ballot(poll).values()))
+            self.assertEqual(get_poll_version(poll.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_poll_version(poll.id), version)
         response = self.client.get(url)
+        self.assertEqual(response.context["charts"][0]["counts"][0], 1)
+
+    def test_stats_count_hits_misses_and_invalidations(self):
+        poll = create_poll()
+        before = cache_stats()
+        url = reverse("polls:results", args=(poll.id,))
+        self.client.get(url)
+        self.client.get(url)
+        Answer.objects.create(choice=poll.questions.first().choices.first())
+        self.client.get(url)
+
+        after = self.client.get(reverse("polls:cache_stats")).json()
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 2)
+        self.assertEqual(after["invalidations"] - before["invalidations"], 1)
+
+
+class PollStructureTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_view_renders_from_cached_structure(self):
+        poll = create_poll()
+        url = reverse("polls:detail", args=(poll.id,))
+        self.client.get(url)
+        # A vote expires the cached page, but not the poll structure.
+        self.client.post(reverse("polls:vote_api", args=(poll.id,)), full_ballot(poll))
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, "Choice 2", count=2)
+
+    def test_choice_change_invalidates_structure(self):
+        poll = create_poll()
+        self.assertEqual(len(get_poll_structure(poll.id).choice_questions), 6)
+        choice = Choice.objects.create(
+            question=poll.questions.first(), choice_text="Late choice"
+        )
+        structure = get_poll_structure(poll.id)
+        self.assertIn(choice.id, structure.choice_questions)
+        choice.delete()
+        self.assertNotIn(choice.id, get_poll_structure(poll.id).choice_questions)
+
+    def test_moved_questions_and_choices_leave_their_old_poll(self):
+        first, second = create_poll(num_questions=2), create_poll(num_questions=2)
+        question = first.questions.order_by("id").first()
+        choice = first.questions.order_by("id").last().choices.first()
+        get_poll_structure(first.id)
+        get_poll_structure(second.id)
+
+        question.poll = second
+        question.save()
+        structure = get_poll_structure(first.id)
+        self.assertNotIn(question.id, [q.id for q in structure.questions])
+        self.assertEqual(len(get_poll_structure(second.id).questions), 3)
+
+        choice.question = second.questions.order_by("id").first()
+        choice.save()
+        self.assertNotIn(choice.id, get_poll_structure(first.id).choice_questions)
+        self.assertIn(choice.id, get_poll_structure(second.id).choice_questions)
+
+    def test_missing_poll(self):
+        self.assertIsNone(get_poll_structure(0))
+        response = self.client.get(reverse("polls:detail", args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(POLLS_STREAM_INTERVAL=0)
+class PollStreamTests(TestCase):
+    async def test_stream_sends_snapshot_then_changed_tallies(self):
+        poll = await sync_to_async(create_poll)()
+        choice = await Choice.objects.filter(question__poll=poll).afirst()
+        response = await self.async_client.get(
+            reverse("polls:poll_stream", args=(poll.id,))
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+
+        snapshot = await anext(events)
+        self.assertTrue(snapshot.startswith(b"event: snapshot\n"))
+
+        def vote():
+            with self.captureOnCommitCallbacks(execute=True):
+                record_answers(poll.id, [choice.id])
+
+        await sync_to_async(vote)()
+        update = await asyncio.wait_for(anext(events), timeout=5)
+        self.assertEqual(
+            update, f'event: tally\ndata: {{"{choice.id}": 1}}\n\n'.encode()
+        )
+        await events.aclose()
+
+    # Viewers of one poll share its tally reads.
+    async def test_viewers_share_tally_reads(self):
+        poll = await sync_to_async(create_poll)()
+        choice = await Choice.objects.filter(question__poll=poll).afirst()
+        reads = []
+
+        async def read_tallies(poll_id):
+            reads.append(poll_id)
+            return await views.poll_tallies(poll_id)
+
+        url = reverse("polls:poll_stream", args=(poll.id,))
+        with mock.patch.object(views.tally_broadcaster, "read_tallies", read_tallies):
+            streams = []
+            for _ in range(3):
+                response = await self.async_client.get(url)
+                streams.append(aiter(response.streaming_content))
+                await anext(streams[-1])
+
+            def vote():
+                with self.captureOnCommitCallbacks(execute=True):
+                    record_answers(poll.id, [choice.id])
+
+            await sync_to_async(vote)()
+            for events in streams:
+                update = await asyncio.wait_for(anext(events), timeout=5)
+                self.assertTrue(update.startswith(b"event: tally\n"))
+                await events.aclose()
+        self.assertEqual(reads, [poll.id, poll.id])
+
+    async def test_broadcast_ends_with_its_last_viewer(self):
+        updates = PollUpdates()
+        tallies = {1: 0}
+
+        async def read_tallies(poll_id):
+            return dict(tallies)
+
+        broadcaster = TallyBroadcaster(updates, read_tallies)
+        async with broadcaster.listen(7) as listener:
+            async with broadcaster.listen(7) as other:
+                self.assertEqual(other.tallies, listener.tallies)
+            tallies[1] = 2
+            updates.publish(7)
+            changes = await asyncio.wait_for(listener.next_changes(), timeout=5)
+            self.assertEqual(changes, {1: 2})
+        self.assertFalse(broadcaster._channels)
+        self.assertFalse(updates._subscribers)
+
+    async def test_stream_of_missing_poll_is_404(self):
+        response = await self.async_client.get(reverse("polls:poll_stream", args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    POLLS_VOTE_LIMITER="polls.limits.TokenBucketLimiter",
+    POLLS_VOTE_RATE=0.01,
+    POLLS_VOTE_BURST=2,
+    POLLS_ONE_VOTE_PER_SESSION=True,
+)
+class VoteLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        limits._limiters.clear()
+
+    def test_burst_is_rejected_before_database_work(self):
+        poll = create_poll()
+        url = reverse("polls:vote_api", args=(poll.id,))
+        ballot = full_ballot(poll)
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, ballot).status_code, 201)
+
+        before = limits.rejection_stats()["rate_limited"]
+        with self.assertNumQueries(0):
+            response = self.client.post(url, ballot)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "100")
+        self.assertEqual(limits.rejection_stats()["rate_limited"], before + 1)
+        self.assertEqual(Answer.objects.count(), 4)
+
+        # Other clients have buckets of their own.
+        response = self.client.post(url, ballot, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, 201)
+
+    def test_all_vote_views_share_the_bucket(self):
+        poll = create_poll()
+        ballot = full_ballot(poll)
+        self.client.post(reverse("polls:vote_api", args=(poll.id,)), ballot)
+        with mock.patch.object(answer_writer, "submit"):
+            self.client.post(reverse("polls:vote_async", args=(poll.id,)), ballot)
+        response = self.client.post(reverse("polls:vote", args=(poll.id,)), ballot)
+        self.assertEqual(response.status_code, 429)
+
+    def test_sessions_have_buckets_of_their_own(self):
+        poll, other = create_poll(), create_poll()
+        # The first vote comes from the address and creates the session.
+        self.client.post(reverse("polls:vote", args=(poll.id,)), full_ballot(poll))
+        with mock.patch.object(answer_writer, "submit"):
+            response = self.client.post(
+                reverse("polls:vote_async", args=(other.id,)), full_ballot(other)
+            )
+        self.assertEqual(response.status_code, 202)
+
+        url = reverse("polls:vote_api", args=(other.id,))
+        self.assertEqual(Client().post(url, full_ballot(other)).status_code, 201)
+        self.assertEqual(Client().post(url, full_ballot(other)).status_code, 429)
+
+    def test_limit_keys(self):
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(limits.client_key(request), "ip:10.0.0.1")
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = "key"
+        self.assertEqual(limits.client_key(request), "session:key")
+
+        request = RequestFactory().post(
+            "/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 10.0.0.3"
+        )
+        self.assertEqual(limits.client_key(request), "ip:10.0.0.1")
+        with override_settings(POLLS_TRUSTED_PROXY_HEADER="HTTP_X_FORWARDED_FOR"):
+            self.assertEqual(limits.client_key(request), "ip:10.0.0.3")
+
+    # Forged session cookies are limited by address, rejections take no query.
+    def test_forged_sessions_are_limited_by_address(self):
+        poll = create_poll()
+        url = reverse("polls:vote_api", args=(poll.id,))
+        ballot = full_ballot(poll)
+
+        def post(cookie):
+            self.client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+            return self.client.post(url, ballot).status_code
+
+        self.assertEqual([post("forged1"), post("forged2")], [201, 201])
+        self.assertEqual(post("forged3"), 429)
+        with self.assertNumQueries(0):
+            self.assertEqual(post("forged4"), 429)
+            self.assertEqual(post("forged4"), 429)
+
+    def test_empty_bucket_is_rejected_locally(self):
+        limiter = limits.TokenBucketLimiter(rate=0.01, burst=1)
+        self.assertTrue(limiter.allow("client"))
+        self.assertFalse(limiter.allow("client"))
+        with mock.patch.object(limits, "cache") as shared:
+            self.assertFalse(limiter.allow("client"))
+        shared.get.assert_not_called()
+
+    def test_bucket_refills(self):
+        limiter = limits.TokenBucketLimiter(rate=10, burst=1)
+        self.assertTrue(limiter.allow("client"))
+        with mock.patch("time.time", return_value=time.time() + 0.2):
+            self.assertTrue(limiter.allow("client"))
+
+    @override_settings(POLLS_VOTE_BURST=10)
+    def test_session_votes_once_per_poll(self):
+        poll, other = create_poll(), create_poll()
+        url = reverse("polls:vote", args=(poll.id,))
+        self.assertEqual(self.client.post(url, full_ballot(poll)).status_code, 302)
+
+        response = self.client.post(url, full_ballot(poll))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            response.context["error_message"], "You already voted in this poll."
+        )
+        response = self.client.post(
+            reverse("polls:vote_api", args=(poll.id,)), full_ballot(poll)
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Answer.objects.count(), 2)
+        self.assertGreaterEqual(limits.rejection_stats()["voted"], 2)
+
+        response = self.client.post(
+            reverse("polls:vote", args=(other.id,)), full_ballot(other)
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_rejections_are_exported(self):
+        response = self.client.get(reverse("polls:metrics"))
+        self.assertContains(response, 'polls_vote_rejections_total{reason="voted"}')
+
+
+class AsyncVoteApiTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        answer_writer.stop()
+
+    def test_vote_is_queued_and_saved_by_writer(self):
+        poll = create_poll(num_questions=3)
+        response = self.client.post(
+            reverse("polls:vote_async", args=(poll.id,)), full_ballot(poll)
+        )
+        self.assertEqual(response.status_code, 202)
+        answer_writer.stop()
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_invalid_vote_is_rejected_before_queueing(self):
+        poll = create_poll(num_questions=3)
+        ballot = full_ballot(poll)
+        ballot.popitem()
+        response = self.client.post(
+            reverse("polls:vote_async", args=(poll.id,)), ballot
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Please answer all questions"})
+        self.assertEqual(answer_writer.pending(), 0)
+
+    def test_full_queue_returns_503(self):
+        poll = create_poll()
+        with mock.patch.object(answer_writer, "submit", side_effect=queue.Full):
+            response = self.client.post(
+                reverse("polls:vote_async", args=(poll.id,)),
+                full_ballot(poll),
+                headers={"Idempotency-Key": "ballot-1"},
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        # The ballot wasn't queued, so a retry with the same key can still vote.
+        self.assertFalse(VoteSubmission.objects.exists())
+
+    def test_retry_with_idempotency_key_is_queued_once(self):
+        poll = create_poll(num_questions=3)
+        url = reverse("polls:vote_async", args=(poll.id,))
+        headers = {"Idempotency-Key": "ballot-1"}
+        for _ in range(3):
+            response = self.client.post(url, full_ballot(poll), headers=headers)
+            self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        answer_writer.stop()
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_writer_drains_queue_on_stop(self):
+        poll = create_poll(num_questions=2)
+        choice_ids = list(full_ballot(poll).values())
+        writer = AnswerWriter(queue_size=10, batch_size=100, flush_ms=60 * 1000)
+        for _ in range(3):
+            writer.submit(poll.id, choice_ids)
+        writer.stop()
+        self.assertEqual(Answer.objects.count(), 6)
+        self.assertEqual(
+            annotate_vote_totals(Choice.objects.filter(id=choice_ids[0]))
+            .get()
+            .total_votes,
+            3,
+        )
+
+    def test_writer_survives_failing_batch(self):
+        poll = create_poll(num_questions=2)
+        choice_ids = list(full_ballot(poll).values())
+        writer = AnswerWriter(queue_size=10, batch_size=100, flush_ms=60 * 1000)
+        writer.submit(poll.id, ["not a choice id"])
+        writer.submit(poll.id, choice_ids)
+        with self.assertLogs("polls.writer", "ERROR"):
+            writer.stop()
+        self.assertEqual(Answer.objects.count(), 2)
+
+        # A thread that died anyway is restarted by the next ballot.
+        failing = threading.Event()
+
+        def fail():
+            failing.wait()
+            raise RuntimeError
+
+        with mock.patch.object(writer, "_collect", fail):
+            with mock.patch("threading.excepthook"):
+                writer.start()
+                thread = writer._thread
+                failing.set()
+                thread.join()
+        writer.submit(poll.id, choice_ids)
+        self.assertIsNot(writer._thread, thread)
+        writer.stop()
+        self.assertEqual(Answer.objects.count(), 4)
+
+
+class AnswerRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = create_poll(num_questions=1)
+        self.choice = self.poll.questions.first().choices.first()
+
+    def answer_at(self, created_at):
+        answer = Answer.objects.create(choice=self.choice)
+        Answer.objects.filter(id=answer.id).update(created_at=created_at)
+
+    def series(self, **params):
+        url = reverse("polls:poll_timeseries", args=(self.poll.id,))
+        return self.client.get(url, params).json()["series"]
+
+    def test_rollups_are_incremental(self):
+        day = datetime.datetime(2023, 11, 14)
+        self.answer_at(day.replace(hour=10, minute=5))
+        self.answer_at(day.replace(hour=10, minute=40))
+        self.assertEqual(roll_up_answers(), 2)
+
+        self.answer_at(day.replace(hour=11))
+        self.assertEqual(roll_up_answers(), 1)
+        self.assertEqual(roll_up_answers(), 0)
+
+        series = self.series(granularity="hour", start="2023-11-14", end="2023-11-15")
+        self.assertEqual(
+            [(point["bucket"], point["count"]) for point in series],
+            [("2023-11-14T10:00:00", 2), ("2023-11-14T11:00:00", 1)],
+        )
+        series = self.series(granularity="day", start="2023-11-01", end="2023-12-01")
+        self.assertEqual(
+            series,
+            [{"choice": self.choice.id, "bucket": "2023-11-14T00:00:00", "count": 3}],
+        )
+
+    def test_recent_answers_wait_for_lag(self):
+        Answer.objects.create(choice=self.choice)
+        self.assertEqual(roll_up_answers(), 0)
+        self.assertEqual(roll_up_answers(lag=datetime.timedelta(0)), 1)
+
+    # Aware times are converted to the project's time zone, Europe/Bratislava.
+    def test_aware_times(self):
+        self.answer_at(datetime.datetime(2023, 11, 14, 10, 5))
+        roll_up_answers()
+        series = self.series(
+            granularity="hour",
+            start="2023-11-14T08:30:00Z",
+            end="2023-11-14T12:00:00+02:00",
+        )
+        self.assertEqual([point["bucket"] for point in series], ["2023-11-14T10:00:00"])
+
+        series = self.series(granularity="day", start="2023-11-01T00:00:00+02:00")
+        self.assertEqual([point["count"] for point in series], [1])
+
+    def test_invalid_range_is_rejected(self):
+        url = reverse("polls:poll_timeseries", args=(self.poll.id,))
+        response = self.client.get(
+            url, {"granularity": "minute", "start": "2020-01-01"}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {"granularity": "week"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ArchiveAnswersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rolled_up_answers_move_and_results_stay(self):
+        old, new = create_poll(num_questions=1), create_poll(num_questions=1)
+        old_choice = old.questions.first().choices.first()
+        new_choice = new.questions.first().choices.first()
+        for choice in (old_choice, old_choice, new_choice):
+            Answer.objects.create(choice=choice)
+        Poll.objects.filter(id=old.id).update(
+            created_at=timezone.now() - datetime.timedelta(days=100)
+        )
+        day = timezone.now() - datetime.timedelta(minutes=1)
+        Answer.objects.update(created_at=day)
+        roll_up_answers(lag=datetime.timedelta(0))
+        # Not yet in the rollups, so it stays.
+        Answer.objects.create(choice=old_choice)
+
+        call_command("archive_answers", stdout=open(os.devnull, "w"))
+        self.assertEqual(ArchivedAnswer.objects.filter(choice=old_choice).count(), 2)
+        self.assertEqual(
+            sorted(Answer.objects.values_list("choice_id", flat=True)),
+            sorted([old_choice.id, new_choice.id]),
+        )
+
+        reconcile_votes()
+        response = self.client.get(reverse("polls:results", args=(old.id,)))
+        self.assertEqual(response.context["charts"][0]["counts"][0], 3)
+        series = self.client.get(
+            reverse("polls:poll_timeseries", args=(old.id,)), {"granularity": "day"}
+        ).json()["series"]
+        self.assertEqual(sum(point["count"] for point in series), 2)
+
+    def test_given_polls_are_archived_regardless_of_age(self):
+        poll = create_poll(num_questions=1)
+        Answer.objects.create(choice=poll.questions.first().choices.first())
+        Answer.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        roll_up_answers()
+
+        call_command("archive_answers", stdout=open(os.devnull, "w"))
+        self.assertFalse(ArchivedAnswer.objects.exists())
+        call_command("archive_answers", poll=[poll.id], stdout=open(os.devnull, "w"))
+        self.assertEqual(ArchivedAnswer.objects.count(), 1)
+        self.assertFalse(Answer.objects.exists())
+
+
+class BallotAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = create_poll(num_questions=3)
+        self.questions = [
+            list(question.choices.order_by("id").values_list("id", flat=True))
+            for question in self.poll.questions.order_by("id")
+        ]
+        self.question_ids = list(
+            self.poll.questions.order_by("id").values_list("id", flat=True)
+        )
+
+    def test_vote_views_record_ballots(self):
+        ballot = full_ballot(self.poll)
+        self.client.post(reverse("polls:vote", args=(self.poll.id,)), ballot)
+        self.client.post(reverse("polls:vote_api", args=(self.poll.id,)), ballot)
+
+        ballots = Ballot.objects.filter(poll=self.poll)
+        self.assertEqual(ballots.count(), 2)
+        for saved in ballots:
+            self.assertEqual(
+                sorted(saved.answers.values_list("choice_id", flat=True)),
+                sorted(ballot.values()),
+            )
+
+    def test_crosstab_matches_counted_ballots(self):
+        rng = random.Random(0)
+        ballots = [
+            [rng.choice(choices) for choices in self.questions] for _ in range(300)
+        ]
+        record_ballots([(self.poll.id, ballot) for ballot in ballots])
+        # Answers saved before ballots were recorded are left out.
+        Answer.objects.create(choice_id=self.questions[0][0])
+
+        first, by = self.question_ids[0], self.question_ids[2]
+        data = analytics.poll_analytics(self.poll.id, first, by)
+        counted = collections.Counter((ballot[0], ballot[2]) for ballot in ballots)
+        self.assertEqual(data["ballots"], 300)
+        self.assertEqual(data["crosstab"]["rows"], self.questions[0])
+        self.assertEqual(
+            data["crosstab"]["counts"],
+            [
+                [counted[row, column] for column in self.questions[2]]
+                for row in self.questions[0]
+            ],
+        )
+
+    def test_correlations(self):
+        # The second question always repeats the first, the third is independent.
+        ballots = [
+            [first, self.questions[1][index], third]
+            for index, first in enumerate(self.questions[0])
+            for third in self.questions[2]
+        ]
+        record_ballots([(self.poll.id, ballot) for ballot in ballots * 2])
+
+        correlations = analytics.poll_analytics(self.poll.id)["correlations"]
+        self.assertEqual(correlations[0][0], 1.0)
+        self.assertAlmostEqual(correlations[0][1], 1.0)
+        self.assertAlmostEqual(correlations[1][0], 1.0)
+        self.assertAlmostEqual(correlations[0][2], 0.0)
+        self.assertAlmostEqual(correlations[2][1], 0.0)
+
+    def test_archived_ballots_count(self):
+        record_ballots([(self.poll.id, [c[0] for c in self.questions])] * 3)
+        roll_up_answers()
+        archive_answers([self.poll.id])
+        record_ballots([(self.poll.id, [c[1] for c in self.questions])])
+
+        data = analytics.poll_analytics(
+            self.poll.id, self.question_ids[0], self.question_ids[1]
+        )
+        self.assertEqual(data["ballots"], 4)
+        self.assertEqual(data["crosstab"]["counts"], [[3, 0, 0], [0, 1, 0], [0, 0, 0]])
+
+    def test_api(self):
+        record_ballots([(self.poll.id, [c[0] for c in self.questions])])
+        url = reverse("polls:poll_analytics", args=(self.poll.id,))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create_user("analyst"))
+        response = self.client.get(
+            url, {"question": self.question_ids[1], "by": self.question_ids[2]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["crosstab"]["counts"][0], [1, 0, 0])
+        self.assertEqual(response.json()["questions"], self.question_ids)
+
+        response = self.client.get(url, {"question": self.question_ids[1]})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {"question": 0, "by": self.question_ids[1]})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("polls:poll_analytics", args=(0,)))
         self.assertEqual(response.status_code, 404)
 
-    def test_past_question(self):
-        past_question = create_question(question_text="Past Question.", days=5)
-        url = reverse("polls:detail", args=(past_question.id,))
+    def test_cached_analytics_need_sign_in(self):
+        url = reverse("polls:poll_analytics", args=(self.poll.id,))
+        analyst = Client()
+        analyst.force_login(User.objects.create_user("analyst"))
+        self.assertEqual(analyst.get(url).status_code, 200)
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with self.assertNumQueries(2):
+            self.assertEqual(analyst.get(url).status_code, 200)
+
+
+class ExportAnswersTests(StreamedMemoryMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = create_poll(num_questions=2)
+        self.choice_ids = list(full_ballot(self.poll).values())
+
+    def export(self, *args, **options):
+        output = StringIO()
+        call_command(
+            "export_answers",
+            self.poll.id,
+            *args,
+            stdout=output,
+            stderr=StringIO(),
+            **options,
+        )
+        return list(csv.reader(StringIO(output.getvalue())))
+
+    def test_csv_has_live_and_archived_answers_in_id_order(self):
+        answers = record_answers(self.poll.id, self.choice_ids * 2)
+        Answer.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        roll_up_answers()
+        archive_answers([self.poll.id])
+        record_answers(self.poll.id, self.choice_ids)
+        other = create_poll()
+        record_answers(other.id, list(full_ballot(other).values()))
+
+        rows = self.export()
+        self.assertEqual(rows[0], export.COLUMNS)
+        self.assertEqual(len(rows), 7)
+        ids = [int(row[0]) for row in rows[1:]]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(ids[:4], [answer.id for answer in answers])
+        question = self.poll.questions.order_by("id").first()
+        self.assertEqual(
+            rows[1][1:6],
+            [
+                str(self.poll.id),
+                str(question.id),
+                question.question_text,
+                str(self.choice_ids[0]),
+                "Choice 0",
+            ],
+        )
+
+    def test_resumes_after_watermark(self):
+        first = record_answers(self.poll.id, self.choice_ids)
+        second = record_answers(self.poll.id, self.choice_ids)
+        rows = self.export(after=first[-1].id)
+        self.assertEqual([int(row[0]) for row in rows], [a.id for a in second])
+
+    def test_api_streams_csv_to_signed_in_users(self):
+        record_answers(self.poll.id, self.choice_ids)
+        url = reverse("polls:answer_export", args=(self.poll.id,))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create_user("analyst"))
         response = self.client.get(url)
-        self.assertContains(response, past_question.question_text)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 3)
+        response = self.client.get(url, {"type": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_parquet_needs_pyarrow(self):
+        with mock.patch.dict(sys.modules, {"pyarrow": None}):
+            with self.assertRaisesMessage(CommandError, "needs pyarrow"):
+                self.export(format="parquet", output=os.devnull)
+
+    @skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is optional")
+    def test_parquet_export(self):
+        import pyarrow.parquet
+
+        record_answers(self.poll.id, self.choice_ids * 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "answers.parquet")
+            self.export(format="parquet", output=path)
+            table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.column_names, export.COLUMNS)
+        self.assertEqual(table.num_rows, 6)
+
+    # Peak memory is bounded by the chunk size, not by the number of answers.
+    def test_memory_does_not_grow_with_answers(self):
+        def stream(poll):
+            return lambda: export.csv_chunks(
+                export.answer_rows(poll.id, chunk_size=100)
+            )
+
+        few, many = create_poll(), create_poll()
+        for poll, times in ((few, 1), (many, 5000)):
+            record_answers(poll.id, list(full_ballot(poll).values()) * times)
+        self.assertMemoryBounded(stream(few), stream(many), growth=1.25)
+
+
+class ImportPollsTests(TestCase):
+    definitions = [
+        {
+            "poll_name": "Lunch",
+            "questions": [
+                {
+                    "question_text": "Where?",
+                    "pub_date": "2024-05-01T12:00:00",
+                    "choices": ["Canteen", {"choice_text": "Park"}],
+                },
+                {"question_text": "When?", "choices": ["Noon"]},
+            ],
+        },
+        {
+            "poll_name": "Dinner",
+            "questions": [{"question_text": "Where?", "choices": ["Home"]}],
+        },
+    ]
+    csv_file = (
+        "poll_name,question_text,pub_date,choice_text\n"
+        "Lunch,Where?,2024-05-01T12:00:00,Canteen\n"
+        "Lunch,Where?,,Park\n"
+        "Lunch,When?,,Noon\n"
+        "Dinner,Where?,,Home\n"
+    )
+
+    def import_file(self, name, content):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, name)
+            with open(path, "w") as file:
+                file.write(content)
+            output = StringIO()
+            call_command("import_polls", path, stdout=output)
+        return output.getvalue()
+
+    def assertImported(self):
+        lunch, dinner = Poll.objects.order_by("id")
+        self.assertEqual((lunch.poll_name, dinner.poll_name), ("Lunch", "Dinner"))
+        where, when = lunch.questions.order_by("id")
+        self.assertEqual(where.pub_date, datetime.datetime(2024, 5, 1, 12))
+        self.assertEqual(
+            list(where.choices.order_by("id").values_list("choice_text", flat=True)),
+            ["Canteen", "Park"],
+        )
+        self.assertEqual(when.choices.get().choice_text, "Noon")
+        self.assertEqual(dinner.questions.get().choices.get().choice_text, "Home")
+
+    def test_json_file(self):
+        output = self.import_file("polls.json", json.dumps(self.definitions))
+        self.assertIn("Imported 2 polls, 3 questions and 4 choices", output)
+        self.assertImported()
+
+    def test_csv_file(self):
+        output = self.import_file("polls.csv", self.csv_file)
+        self.assertIn("Imported 2 polls, 3 questions and 4 choices", output)
+        self.assertImported()
+
+    def test_one_insert_per_table(self):
+        polls = importing.parse_json(self.definitions * 50)
+        with CaptureQueriesContext(connection) as queries:
+            poll_ids = importing.import_polls(polls)
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(len(poll_ids), 100)
+        self.assertEqual(
+            list(Poll.objects.order_by("id").values_list("id", flat=True)), poll_ids
+        )
+        self.assertEqual(Choice.objects.count(), 200)
+
+    def test_invalid_file_imports_nothing(self):
+        invalid = self.csv_file + "Dinner,When?,yesterday,\n"
+        with self.assertRaises(CommandError) as raised:
+            self.import_file("polls.csv", invalid)
+        self.assertIn("line 6: invalid pub_date 'yesterday'", str(raised.exception))
+        self.assertIn("line 6: choice_text is required", str(raised.exception))
+        self.assertFalse(Poll.objects.exists())
+
+        definitions = [{"poll_name": "x" * 101, "questions": []}]
+        with self.assertRaises(importing.InvalidImport) as raised:
+            importing.parse_json(definitions)
+        self.assertEqual(
+            raised.exception.errors,
+            [
+                "polls[0]: a poll needs at least one question",
+                "polls[0]: poll_name is longer than 100 characters",
+            ],
+        )
+
+    def test_failing_import_is_rolled_back(self):
+        polls = importing.parse_json(self.definitions)
+        with mock.patch.object(
+            Choice.objects, "bulk_create", side_effect=IntegrityError
+        ):
+            with self.assertRaises(IntegrityError):
+                importing.import_polls(polls)
+        self.assertFalse(Poll.objects.exists())
+        self.assertFalse(Question.objects.exists())
+
+    def test_api(self):
+        url = reverse("polls:poll_import")
+        self.client.force_login(User.objects.create_user("user"))
+        response = self.client.post(url, self.definitions, "application/json")
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = self.client.post(url, self.definitions, "application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json()["polls"],
+            list(Poll.objects.order_by("id").values_list("id", flat=True)),
+        )
+        self.assertImported()
+
+        response = self.client.post(url, self.csv_file, "text/csv")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["choices"], 4)
+
+        response = self.client.post(url, {"polls": [{}]}, "application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Poll.objects.count(), 4)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+
+    def test_answer_changelist_queries_do_not_grow_with_rows(self):
+        poll = create_poll(num_questions=1)
+        choices = list(
+            Choice.objects.filter(question__poll=poll).values_list("id", flat=True)
+        )
+        url = reverse("admin:polls_answer_changelist")
+
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(captured)
+
+        record_answers(poll.id, choices)
+        few = queries()
+        record_answers(poll.id, choices * 30)
+        self.assertEqual(queries(), few)
+
+    def test_answer_page_does_not_list_ballots(self):
+        poll = create_poll(num_questions=1)
+        answer = record_answers(poll.id, [poll.questions.first().choices.first().id])[0]
+        response = self.client.get(
+            reverse("admin:polls_answer_change", args=(answer.id,))
+        )
+        self.assertContains(response, 'name="ballot"')
+        self.assertNotContains(response, '<select name="ballot"')
+
+    def test_choice_page_counts_answers_without_loading_them(self):
+        poll = create_poll(num_questions=1)
+        choice = poll.questions.first().choices.first()
+        record_answers(poll.id, [choice.id] * 5)
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(
+                reverse("admin:polls_choice_change", args=(choice.id,))
+            )
+        self.assertContains(response, "Answer count")
+        self.assertFalse(
+            any('FROM "polls_answer"' in query["sql"] for query in captured)
+        )
+        response = self.client.get(reverse("admin:polls_choice_add"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_reset_action_clears_selected_polls(self):
+        reset, kept = create_poll(num_questions=2), create_poll(num_questions=2)
+        for poll in (reset, kept):
+            record_answers(poll.id, list(full_ballot(poll).values()))
+        Answer.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        roll_up_answers()
+
+        response = self.client.post(
+            reverse("admin:polls_poll_changelist"),
+            {"action": "reset_poll_answers", "_selected_action": [reset.id]},
+        )
+        self.assertEqual(response.status_code, 302)
+        totals = annotate_poll_totals(Poll.objects.order_by("id"))
+        self.assertEqual([poll.answer_count for poll in totals], [0, 2])
+        self.assertFalse(Answer.objects.filter(choice__question__poll=reset).exists())
+        self.assertFalse(
+            AnswerRollup.objects.filter(choice__question__poll=reset).exists()
+        )
+        self.assertEqual(Answer.objects.count(), 2)
+
+    def test_unfiltered_count_is_estimated(self):
+        poll = create_poll(num_questions=1)
+        record_answers(poll.id, list(full_ballot(poll).values()) * 3)
+        Answer.objects.filter(id=Answer.objects.order_by("id")[1].id).delete()
+
+        answers = Answer.objects.order_by("id")
+        with mock.patch.object(EstimatedCountPaginator, "exact_below", 0):
+            self.assertEqual(EstimatedCountPaginator(answers, 10).count, 3)
+            self.assertEqual(
+                EstimatedCountPaginator(answers.filter(id__gt=0), 10).count, 2
+            )
+        self.assertEqual(EstimatedCountPaginator(answers, 10).count, 2)
+
+    def test_deleting_choice_deletes_its_answers(self):
+        poll = create_poll(num_questions=1)
+        choice = poll.questions.first().choices.first()
+        Answer.objects.create(choice=choice)
+        choice.delete()
+        self.assertFalse(Answer.objects.exists())
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite's")
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def query_plans(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+            # Streaming responses run their queries while being consumed.
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries:
+                if query["sql"].startswith("SELECT"):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans[query["sql"]] = [row[-1] for row in cursor.fetchall()]
+        return plans
+
+    def assertNoTableScans(self, request):
+        plans = self.query_plans(request)
+        self.assertTrue(plans)
+        for sql, plan in plans.items():
+            scans = [step for step in plan if step.startswith("SCAN")]
+            self.assertEqual(scans, [], f"{sql}\n{plan}")
+
+    def test_results_queries_use_indexes(self):
+        poll = create_poll(num_questions=5)
+        for other in range(3):
+            create_poll(num_questions=5)
+        url = reverse("polls:results", args=(poll.id,))
+        self.assertNoTableScans(lambda: self.client.get(url))
+
+    def test_index_pages_read_the_keyset_index(self):
+        for _ in range(3):
+            create_poll(num_questions=1)
+        url = reverse("polls:index")
+        cursor = encode_cursor(Poll.objects.order_by("id").last())
+        for params in ({}, {"cursor": cursor}):
+            plans = self.query_plans(lambda: self.client.get(url, params))
+            plan = "\n".join(step for steps in plans.values() for step in steps)
+            self.assertIn("poll_created_id_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_api_results_queries_use_indexes(self):
+        poll = create_poll(num_questions=5)
+        url = reverse("polls:poll_data", args=(poll.id,))
+        self.assertNoTableScans(lambda: self.client.get(url))
+
+    def test_vote_queries_use_indexes(self):
+        poll = create_poll(num_questions=5)
+        url = reverse("polls:vote", args=(poll.id,))
+        self.assertNoTableScans(lambda: self.client.post(url, full_ballot(poll)))
+
+    def test_poll_structure_uses_composite_indexes(self):
+        poll = create_poll(num_questions=5)
+        url = reverse("polls:detail", args=(poll.id,))
+        plan = "\n".join(
+            step
+            for plan in self.query_plans(lambda: self.client.get(url)).values()
+            for step in plan
+        )
+        self.assertIn("question_poll_id_idx", plan)
+        self.assertIn("choice_question_id_idx", plan)
+
+    def test_api_vote_queries_use_indexes(self):
+        poll = create_poll(num_questions=5)
+        url = reverse("polls:vote_api", args=(poll.id,))
+        self.assertNoTableScans(lambda: self.client.post(url, full_ballot(poll)))
+
+
+@skipUnless(connection.vendor == "sqlite", "Pragmas are SQLite's")
+class SQLiteConnectionTests(SimpleTestCase):
+    def test_new_connections_are_configured(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = {
+                **connection.settings_dict,
+                "NAME": os.path.join(directory, "db.sqlite3"),
+            }
+            other = type(connections["default"])(database, alias="configured")
+            try:
+                with other.cursor() as cursor:
+                    cursor.execute("PRAGMA busy_timeout")
+                    busy_timeout = cursor.fetchone()[0]
+                    cursor.execute("PRAGMA journal_mode")
+                    journal_mode = cursor.fetchone()[0]
+            finally:
+                other.close()
+        self.assertEqual(busy_timeout, settings.POLLS_SQLITE_BUSY_TIMEOUT)
+        self.assertEqual(journal_mode, "wal")
+
+
+# A second SQLite file stands in for a replica. Polls are copied to it by hand and
+# votes only reach the primary, so replica reads show a lagging tally. The replica
+# is added after the test case is set up and gets a fresh copy for every test.
+@override_settings(POLLS_READ_REPLICAS=["replica"])
+class ReplicaRouterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.replica = os.path.join(cls.directory.name, "replica.sqlite3")
+        cls.migrated = os.path.join(cls.directory.name, "migrated.sqlite3")
+        connections.settings["replica"] = {
+            **connections.settings["default"],
+            "NAME": cls.replica,
+        }
+        call_command("migrate", database="replica", verbosity=0)
+        connections["replica"].close()
+        shutil.copy(cls.replica, cls.migrated)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        connections["replica"].close()
+        shutil.copy(self.migrated, self.replica)
+        cache.clear()
+        self.poll = create_poll()
+        for model in (Poll, Question, Choice):
+            model.objects.using("replica").bulk_create(model.objects.all())
+        record_answers(self.poll.id, list(full_ballot(self.poll).values()))
+
+    def tallies(self, client):
+        response = client.get(reverse("polls:results", args=(self.poll.id,)))
+        return [sum(chart["counts"]) for chart in response.context["charts"]]
+
+    def test_results_read_replica_except_after_voting(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.assertEqual(self.tallies(self.client), [0, 0])
+        self.assertTrue(replica)
+        response = self.client.get(reverse("polls:results", args=(self.poll.id,)))
+        self.assertIn("max-age=5", response["Cache-Control"])
+
+        voter = Client()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = voter.post(
+                reverse("polls:vote", args=(self.poll.id,)), full_ballot(self.poll)
+            )
+        self.assertIn(routers.PRIMARY_COOKIE, response.cookies)
+        self.assertEqual(self.tallies(voter), [2, 2])
+        self.assertEqual(self.tallies(Client()), [0, 0])
+
+        voter.cookies[routers.PRIMARY_COOKIE] = str(time.time() - 1)
+        cache.clear()
+        self.assertEqual(self.tallies(voter), [0, 0])
+
+    # Replica pages are stored for POLLS_REPLICA_LAG seconds, not the page timeout.
+    def test_replica_pages_expire_with_the_lag(self):
+        for url in (
+            reverse("polls:results", args=(self.poll.id,)),
+            reverse("polls:index"),
+        ):
+            self.client.get(url)
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                self.client.get(url)
+            self.assertFalse(replica)
+            with mock.patch("time.time", return_value=time.time() + 6):
+                with CaptureQueriesContext(connections["replica"]) as replica:
+                    self.client.get(url)
+            self.assertTrue(replica)
+
+    def test_pinned_clients_skip_the_index_cache(self):
+        self.client.get(reverse("polls:index"))
+        voter = Client()
+        voter.post(reverse("polls:vote", args=(self.poll.id,)), full_ballot(self.poll))
+        with CaptureQueriesContext(connection) as primary:
+            voter.get(reverse("polls:index"))
+        self.assertTrue(primary)
+
+    def test_poll_structure_is_read_on_primary(self):
+        question = self.poll.questions.order_by("id").first()
+        added = Choice.objects.create(question=question, choice_text="Added")
+        response = self.client.get(reverse("polls:results", args=(self.poll.id,)))
+        self.assertEqual(len(response.context["charts"][0]["labels"]), 4)
+
+        ballot = {**full_ballot(self.poll), f"choice{question.id}": added.id}
+        response = self.client.post(
+            reverse("polls:vote_api", args=(self.poll.id,)), ballot
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_votes_go_to_primary(self):
+        response = self.client.post(
+            reverse("polls:vote_api", args=(self.poll.id,)), full_ballot(self.poll)
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(routers.PRIMARY_COOKIE, response.cookies)
+        self.assertEqual(Answer.objects.count(), 4)
+        self.assertFalse(Answer.objects.using("replica").exists())
+
+    def test_streamed_content_reads_replica(self):
+        response = self.client.get(reverse("polls:poll_data", args=(self.poll.id,)))
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            data = streamed_json(response)
+        self.assertTrue(replica)
+        self.assertEqual(
+            [choice["num_answers"] for choice in data["questions"][0]["choices"]],
+            [0, 0, 0],
+        )
+
+    def test_other_models_use_default(self):
+        router = routers.ReplicaRouter()
+        with routers.reading_replicas():
+            self.assertEqual(router.db_for_read(Poll), "replica")
+            self.assertIsNone(router.db_for_read(User))
+        self.assertIsNone(router.db_for_read(Poll))
+
+    @override_settings(POLLS_READ_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.tallies(self.client), [1, 1])
+        response = self.client.post(
+            reverse("polls:vote", args=(self.poll.id,)), full_ballot(self.poll)
+        )
+        self.assertNotIn(routers.PRIMARY_COOKIE, response.cookies)
+
+
+class DataGeneratorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def generate(self, **options):
+        call_command("data_generator", stdout=open(os.devnull, "w"), **options)
+        return list(Choice.objects.order_by("id").values_list("vote_count", flat=True))
+
+    def test_counters_match_generated_answers(self):
+        self.generate(polls=2, questions=3, choices=4, answers=5, days=2, batch_size=7)
+        self.assertEqual(Poll.objects.count(), 2)
+        self.assertEqual(Choice.objects.count(), 24)
+        self.assertEqual(
+            sum(Choice.objects.values_list("vote_count", flat=True)),
+            Answer.objects.count(),
+        )
+        oldest = Answer.objects.earliest("created_at").created_at
+        self.assertGreaterEqual(oldest, timezone.now() - datetime.timedelta(days=2))
+
+    # Ids of polls rolled back may be reused, their cached structures are dropped.
+    def test_generated_polls_replace_cached_structures(self):
+        try:
+            with transaction.atomic():
+                stale = create_poll(num_questions=1)
+                get_poll_structure(stale.id)
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.generate(polls=1, questions=2, choices=2)
+        structure = get_poll_structure(Poll.objects.get().id)
+        self.assertEqual(len(structure.questions), 2)
+
+    # Answers belong to ballots of their poll, at most one per question and ballot.
+    def test_answers_are_cast_on_ballots(self):
+        self.generate(polls=2, questions=3, choices=4, answers=5, batch_size=7)
+        self.assertFalse(Answer.objects.filter(ballot=None).exists())
+        self.assertFalse(
+            Answer.objects.exclude(ballot__poll=F("choice__question__poll")).exists()
+        )
+        self.assertFalse(
+            Answer.objects.values("ballot", "choice__question")
+            .annotate(answers=Count("id"))
+            .filter(answers__gt=1)
+            .exists()
+        )
+        for poll in Poll.objects.all():
+            most_answered = max(
+                sum(choice.vote_count for choice in question.choices.all())
+                for question in poll.questions.all()
+            )
+            self.assertEqual(poll.ballots.count(), most_answered)
+            data = analytics.poll_analytics(poll.id)
+            self.assertEqual(data["ballots"], most_answered)
+
+        # Ballots created later get ids of their own.
+        last_id = Ballot.objects.order_by("id").last().id
+        self.assertGreater(Ballot.objects.create(poll=poll).id, last_id)
+
+    def test_seed_makes_zipf_data_reproducible(self):
+        options = dict(polls=1, questions=2, choices=5, answers=20, distribution="zipf")
+        first = self.generate(seed=3, **options)
+        second = self.generate(seed=3, **options)
+        self.assertEqual(first, second[len(first) :])
+        self.assertGreater(max(first[:5]), 3 * min(first[:5]))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+
+    def test_requests_are_measured_per_view(self):
+        poll = create_poll(num_questions=2)
+        self.client.get(reverse("polls:results", args=(poll.id,)))
+        self.client.get(reverse("polls:results", args=(poll.id,)))
+
+        response = self.client.get(reverse("polls:metrics"))
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4")
+        metrics = response.content.decode()
+        self.assertIn(
+            'polls_request_duration_seconds_count{view="polls:results"} 2', metrics
+        )
+        # The cold request ran the poll queries, the cached one none.
+        self.assertIn(
+            'polls_request_queries_bucket{view="polls:results",le="0"} 1', metrics
+        )
+        self.assertIn('polls_request_queries_count{view="polls:results"} 2', metrics)
+        self.assertIn("polls_page_cache_hits_total", metrics)
+
+    # Queries run while the response streams are counted once it is consumed.
+    def test_streamed_queries_are_measured(self):
+        poll = create_poll(num_questions=2)
+        response = self.client.get(reverse("polls:poll_data", args=(poll.id,)))
+        metrics = self.client.get(reverse("polls:metrics")).content.decode()
+        self.assertNotIn('view="polls:poll_data"', metrics)
+
+        streamed_json(response)
+        metrics = self.client.get(reverse("polls:metrics")).content.decode()
+        # The poll, then its choices and questions while streaming.
+        self.assertIn('polls_request_queries_sum{view="polls:poll_data"} 3', metrics)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 3, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.samples()), [(1, 1), (5, 3), ("+Inf", 4)])
+        self.assertEqual(histogram.sum, 16)
@@ -1,7 +1,16 @@
 from django.urls import path
 
 from . import views
-from .views import VoteApiView, PollDetailView
+from .views import (
+    AnswerExportView,
+    VoteApiView,
+    PollDetailView,
+    PollAnalyticsView,
+    PollImportView,
+    PollListView,
+    PollTimeSeriesView,
+    CacheStatsView,
+)
 
 app_name = "polls"
 urlpatterns = [
@@ -9,6 +18,19 @@ urlpatterns = [
     path("<int:pk>/", views.DetailView.as_view(), name="detail"),
     path("<int:poll_id>/results/", views.ResultsView.as_view(), name="results"),
     path("<int:poll_id>/vote/", views.vote, name="vote"),
+    path("api/polls/", PollListView.as_view(), name="poll_list"),
+    path("api/polls/import/", PollImportView.as_view(), name="poll_import"),
     path("api/<int:poll_id>/vote/", VoteApiView.as_view(), name="vote_api"),
+    path("api/<int:poll_id>/vote/async/", views.vote_async, name="vote_async"),
     path("api/<int:pk>/results/", PollDetailView.as_view(), name="poll_data"),
+    path(
+        "api/<int:pk>/timeseries/",
+        PollTimeSeriesView.as_view(),
+        name="poll_timeseries",
+    ),
+    path("api/<int:pk>/stream/", views.poll_stream, name="poll_stream"),
+    path("api/<int:pk>/export/", AnswerExportView.as_view(), name="answer_export"),
+    path("api/<int:pk>/analytics/", PollAnalyticsView.as_view(), name="poll_analytics"),
+    path("api/cache/stats/", CacheStatsView.as_view(), name="cache_stats"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
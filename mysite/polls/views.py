@@ -1,188 +1,618 @@
-from django.http import HttpResponseRedirect
+import asyncio
+import datetime
+import io
+import json
+import queue
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views import generic
-from django.db.models import Count, Prefetch
-from django.db import transaction
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 
-from .models import Choice, Question, Poll, Answer
+from .analytics import poll_analytics
+from .caching import cache_poll_page, cache_replica_page, cache_stats, poll_data_key
+from .counters import annotate_poll_totals, annotate_vote_totals
+from .export import FORMATS as EXPORT_FORMATS
+from .export import ExportUnavailable, answer_rows
+from .importing import InvalidImport, import_polls, parse_csv, parse_json
+from .idempotency import (
+    InvalidKey,
+    forget_response,
+    request_key,
+    store_response,
+    stored_response,
+    submit_once,
+)
+from .limits import allow_vote, already_voted, mark_voted, retry_after
+from .metrics import render_metrics
+from .models import AnswerRollup, Choice, Poll, Question
+from .pagination import InvalidCursor, poll_page
+from .pubsub import TallyBroadcaster, poll_updates
+from .routers import pin_primary, replica_reads
+from .structure import check_ballot, get_poll_structure
+from .voting import record_answers
+from .writer import answer_writer
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from polls.serializers import AnswerSerializer, PollDetailSerializer
-from rest_framework import status
-from rest_framework.generics import RetrieveAPIView
+from polls.serializers import (
+    AnswerRollupSerializer,
+    AnswerSerializer,
+    PollListSerializer,
+)
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
 
-# Displays the polls.
-@method_decorator(cache_page(60 * 60), name="dispatch")
+# Displays a page of polls, newest first, with their question and answer totals.
+@method_decorator([cache_replica_page(60), replica_reads], name="dispatch")
 class IndexView(generic.ListView):
     model = Poll
     template_name = "polls/index.html"
     context_object_name = "polls"
 
+    def get_queryset(self):
+        try:
+            polls, self.next_cursor = poll_page(
+                annotate_poll_totals(Poll.objects.all()),
+                self.request.GET.get("cursor"),
+            )
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return polls
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_cursor"] = self.next_cursor
+        return context
+
 
 # Displays the poll with questions.
-@method_decorator(cache_page(60 * 60), name="dispatch")
+@method_decorator(cache_poll_page(60 * 60), name="dispatch")
 class DetailView(generic.DetailView):
     model = Poll
     template_name = "polls/questions.html"
     context_object_name = "poll"
 
+    def get_object(self, queryset=None):
+        structure = get_poll_structure(self.kwargs.get("pk"))
+        if structure is None:
+            raise Http404("No Poll matches the given query.")
+        return structure
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        poll = context["poll"]
-        questions = poll.questions.prefetch_related("choices")
-        context["questions"] = questions
+        context["questions"] = context["poll"].questions
         return context
 
 
 # View to display results for given poll.
-class ResultsView(generic.DetailView):
-    model = Poll
+@method_decorator([cache_poll_page(60 * 60), replica_reads], name="dispatch")
+class ResultsView(generic.TemplateView):
     template_name = "polls/results.html"
 
-    def get_object(self, queryset=None):
-        poll_id = self.kwargs.get("poll_id") 
-        return get_object_or_404(
-            Poll.objects.prefetch_related(
-                Prefetch(
-                    "questions__choices",
-                    queryset=Choice.objects.annotate(answer_count=Count("answers")),
-                )
-            ),
-            id=poll_id,
-        )
-
+    # Questions come from the cached poll structure and tallies from one query.
+    # Stats are rendered in the page, chart data of all questions goes to it as a
+    # single json payload.
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        poll = self.get_object()
-        question_data = []
-
-        for question in poll.questions.all():
-            choice_data = []
-            
-            for choice in question.choices.all():
-                choice_data.append(
-                    {
-                        "choice_text": choice.choice_text,
-                        "answer_count": choice.answer_count,
-                    }
-                )
-            question_data.append(
-                {"question_text": question.question_text, "choices": choice_data}
-            )
+        poll = get_poll_structure(self.kwargs["poll_id"])
+        if poll is None:
+            raise Http404("No Poll matches the given query.")
 
-        context["question_data"] = question_data
+        tallies = dict(
+            annotate_vote_totals(Choice.objects.filter(question__poll_id=poll.id))
+            .order_by()
+            .values_list("id", "total_votes")
+        )
+        context["poll"] = poll
+        context["charts"] = [
+            {
+                "labels": [choice.choice_text for choice in question.choices],
+                "counts": [tallies.get(choice.id, 0) for choice in question.choices],
+            }
+            for question in poll.questions
+        ]
+        # Each question with the (choice text, count) stats listed in the page.
+        context["questions"] = [
+            (question, list(zip(chart["labels"], chart["counts"])))
+            for question, chart in zip(poll.questions, context["charts"])
+        ]
         return context
 
 
 # Saving answer for selected choice or handling uncompleted polls.
-@cache_page(60 * 60)
 def vote(request, poll_id):
-    poll = Poll.objects.prefetch_related("questions").get(pk=poll_id)
-    answers = []
+    if not allow_vote(request):
+        return too_many_votes(HttpResponse("Too many votes, try again later."))
+
+    poll = get_poll_structure(poll_id)
+    if poll is None:
+        raise Http404("No Poll matches the given query.")
+    if already_voted(request, poll.id):
+        return render(
+            request,
+            "polls/questions.html",
+            {
+                "questions": poll.questions,
+                "error_message": "You already voted in this poll.",
+                "poll": poll,
+            },
+            status=403,
+        )
 
-    # Filtering this question that have selected choice, and mark them as true in db.
-    for question in poll.questions.all():
-        selected_choice_ids = [int(request.POST.get(f"choice{question.id}", 0))]
-        
+    selected_choices = {}
+    for question in poll.questions:
+        try:
+            choice_id = int(request.POST.get(f"choice{question.id}", ""))
+        except ValueError:
+            continue
+        if poll.choice_questions.get(choice_id) == question.id:
+            selected_choices[question.id] = choice_id
+
+    if len(selected_choices) != len(poll.questions):
+        missing_questions = [
+            question
+            for question in poll.questions
+            if question.id not in selected_choices
+        ]
+
+        return render(
+            request,
+            "polls/questions.html",
+            {
+                "questions": poll.questions,
+                "error_message": "You didn't select a choice.",
+                "missing_questions": missing_questions,
+                "selected_choices": list(selected_choices.values()),
+                "poll": poll,
+            },
+        )
 
-        with transaction.atomic():
-            choice_queryset = Choice.objects.filter(
-                id__in=selected_choice_ids, question=question
+    record_answers(poll.id, list(selected_choices.values()))
+    mark_voted(request, poll.id, create=True)
+    return pin_primary(HttpResponseRedirect(reverse("polls:results", args=(poll.id,))))
+
+
+# Api view for adding votes.
+class VoteApiView(APIView):
+    def post(self, request, poll_id):
+        if not allow_vote(request):
+            return too_many_votes(JsonResponse({"error": "Too many votes"}))
+
+        try:
+            key = request_key(request)
+        except InvalidKey:
+            return Response(
+                {"error": "Invalid Idempotency-Key header"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            choice_queryset.update(selected=True)
-        # Marking all choices as False except those in the list of selected choices above.
-        Choice.objects.exclude(id__in=selected_choice_ids).filter(
-            question=question
-        ).update(selected=False)
+        if key is None:
+            status_code, data = self.submit(request, poll_id)
+            return self.pin(Response(data, status=status_code))
+
+        status_code, data, replayed = submit_once(
+            poll_id, key, lambda: self.submit(request, poll_id)
+        )
+        response = Response(data, status=status_code)
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+        return self.pin(response)
+
+    def pin(self, response):
+        return pin_primary(response) if response.status_code == 201 else response
+
+    # Validating and saving a ballot, returns (status_code, data).
+    def submit(self, request, poll_id):
+        structure = get_poll_structure(poll_id)
+        if structure is None:
+            raise Http404("No Poll matches the given query.")
+
+        if already_voted(request, poll_id):
+            return status.HTTP_403_FORBIDDEN, {"error": "Already voted in this poll"}
+
+        choice_ids, error = check_ballot(structure, request.POST)
+        if error:
+            return status.HTTP_400_BAD_REQUEST, {"error": error}
+
+        answers = record_answers(poll_id, choice_ids)
+        mark_voted(request, poll_id)
+        serialized_answers = AnswerSerializer(answers, many=True)
+        return status.HTTP_201_CREATED, {
+            "success": "Votes added",
+            "answers": serialized_answers.data,
+        }
+
 
-    for question in poll.questions.all():
+# Async api view validating votes and queueing them for the background writer.
+# With an Idempotency-Key, the 202 response is stored before the ballot is queued.
+async def vote_async(request, poll_id):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    if not await sync_to_async(allow_vote)(request):
+        return too_many_votes(JsonResponse({"error": "Too many votes"}))
+
+    try:
+        key = request_key(request)
+    except InvalidKey:
+        return JsonResponse({"error": "Invalid Idempotency-Key header"}, status=400)
+    if key is not None:
+        stored = await sync_to_async(stored_response)(poll_id, key)
+        if stored is not None:
+            return replayed_response(*stored)
+
+    structure = await sync_to_async(get_poll_structure)(poll_id)
+    if structure is None:
+        raise Http404("No Poll matches the given query.")
+    if await sync_to_async(already_voted)(request, poll_id):
+        return JsonResponse({"error": "Already voted in this poll"}, status=403)
+
+    choice_ids, error = check_ballot(structure, request.POST)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    data = {"success": "Votes queued"}
+    if key is not None:
         try:
-            selected_choice = question.choices.get(
-                pk=request.POST[f"choice{question.id}"]
+            await sync_to_async(store_response)(poll_id, key, 202, data)
+        except IntegrityError:
+            stored = await sync_to_async(stored_response)(poll_id, key)
+            return replayed_response(*stored)
+
+    try:
+        answer_writer.submit(poll_id, choice_ids)
+    except queue.Full:
+        if key is not None:
+            await sync_to_async(forget_response)(poll_id, key)
+        response = JsonResponse(
+            {"error": "Too many votes, try again later"}, status=503
+        )
+        response["Retry-After"] = "1"
+        return response
+    mark_voted(request, poll_id)
+    return pin_primary(JsonResponse(data, status=202))
+
+
+# Rejecting a vote over the rate limit of its client.
+def too_many_votes(response):
+    response.status_code = 429
+    response["Retry-After"] = str(retry_after())
+    return response
+
+
+def replayed_response(status_code, data):
+    response = JsonResponse(data, status=status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+# Like VoteApiView, the api is used without csrf tokens.
+vote_async.csrf_exempt = True
+
+
+# Api view streaming the answers of a poll as CSV or parquet, for signed in users.
+# Exports are resumed with ?after=<last exported answer id>, ?type=parquet selects
+# the columnar format.
+@method_decorator(replica_reads, name="dispatch")
+class AnswerExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        if get_poll_structure(pk) is None:
+            raise Http404("No Poll matches the given query.")
+        # "format" is taken by the content negotiation of rest framework.
+        export_format = request.query_params.get("type", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Type must be one of {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            answer = Answer(choice=selected_choice)
-            answers.append(answer)
-
-        except (KeyError, Choice.DoesNotExist):
-            missing_questions = [question for question in poll.questions.all()\
-                if not request.POST.get(f"choice{question.id}")]
-
-            return render(
-                request,
-                "polls/questions.html",
-                {
-                    "questions": poll.questions.all(),
-                    "error_message": "You didn't select a choice.",
-                    "missing_questions": missing_questions,
-                    "poll": poll,
-                },
+        try:
+            after = int(request.query_params.get("after", 0))
+        except ValueError:
+            return Response(
+                {"error": "Invalid after"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-    else:
-        for answer in answers:
-            answer.save()
-        for question in poll.questions.all():
-            for choice in question.choices.all():
-                choice.selected_false()
+        write_chunks, content_type = EXPORT_FORMATS[export_format]
+        try:
+            chunks = write_chunks(answer_rows(pk, after))
+        except ExportUnavailable as error:
+            return Response(
+                {"error": str(error)}, status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="poll-{pk}-answers.{export_format}"'
+        )
+        return response
 
-        return HttpResponseRedirect(reverse("polls:results", args=(poll.id,)))
 
+# Api view for staff creating many polls at once, from a JSON body or a text/csv
+# body in the formats of polls.importing. Invalid files are rejected whole.
+class PollImportView(APIView):
+    permission_classes = [IsAdminUser]
 
-# Api view for adding votes.
-class VoteApiView(APIView):
-    def post(self, request, poll_id):
-        poll = Poll.objects.get(pk=poll_id)
-        answers_data = request.POST
-        questions = poll.questions.all().count()
-        answers = []
-
-        """ Geting question id from key in request +
-        it's selected choice_id and adding answers to the list. """
-        for question_id, choice_id in answers_data.items():
-            if question_id.startswith("choice") and choice_id:
-                try:
-                    question_id = int(question_id.replace("choice", ""))
-                    question = Question.objects.get(pk=question_id, poll=poll)
-                    choice = Choice.objects.get(pk=choice_id, question=question)
-                    answer = Answer(choice=choice)
-                    answers.append(answer)
-                except (Question.DoesNotExist, Choice.DoesNotExist, ValueError):
-                    return Response(
-                        {"error": "Invalid question or choice"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-        if answers:
-            serialized_answers = AnswerSerializer(answers, many=True)
-            if len(answers) == questions:
-                for answer in answers:
-                    answer.save()
-                return Response(
-                    {"success": "Votes added", "answers": serialized_answers.data},
-                    status=status.HTTP_201_CREATED,
-                )
+    def post(self, request):
+        start = time.perf_counter()
+        try:
+            if request.content_type.startswith("text/csv"):
+                polls = parse_csv(io.StringIO(request.body.decode(), newline=""))
             else:
-                return Response(
-                    {"error": "Please answer all questions"},
-                    status=status.HTTP_400_BAD_REQUEST,
+                polls = parse_json(request.data)
+        except UnicodeDecodeError:
+            return Response(
+                {"errors": ["file: not UTF-8"]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except InvalidImport as error:
+            return Response(
+                {"errors": error.errors}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        poll_ids = import_polls(polls)
+        return Response(
+            {
+                "polls": poll_ids,
+                "questions": sum(len(poll.questions) for poll in polls),
+                "choices": sum(
+                    len(question.choices)
+                    for poll in polls
+                    for question in poll.questions
+                ),
+                "seconds": round(time.perf_counter() - start, 3),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+# Api view for signed in users with cross-tabulations of a poll's ballots, how
+# voters of each choice of ?question=<id> answered ?by=<id>, and the association
+# of every pair of questions. Results are cached for a minute after the permission
+# check, votes don't expire them.
+@method_decorator(replica_reads, name="dispatch")
+class PollAnalyticsView(APIView):
+    permission_classes = [IsAuthenticated]
+    cache_timeout = 60
+
+    def get(self, request, pk):
+        question = request.query_params.get("question")
+        by = request.query_params.get("by")
+        try:
+            if question is not None or by is not None:
+                question, by = int(question), int(by)
+            key = poll_data_key(pk, "analytics", question, by)
+            data = cache.get(key)
+            if data is None:
+                data = poll_analytics(pk, question, by)
+                if data is not None:
+                    cache.set(key, data, self.cache_timeout)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "question and by must be question ids of the poll"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if data is None:
+            raise Http404("No Poll matches the given query.")
+        return Response(data)
+
+
+# Api view listing polls a page at a time, same order and totals as the index.
+@method_decorator(replica_reads, name="dispatch")
+class PollListView(APIView):
+    def get(self, request):
+        try:
+            polls, next_cursor = poll_page(
+                annotate_poll_totals(Poll.objects.all()),
+                request.query_params.get("cursor"),
+            )
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        next_url = None
+        if next_cursor:
+            next_url = request.build_absolute_uri(
+                f"{reverse('polls:poll_list')}?{urlencode({'cursor': next_cursor})}"
+            )
+        return Response(
+            {"results": PollListSerializer(polls, many=True).data, "next": next_url}
+        )
+
+
+# api view for geting statistic data, streamed question by question. Counts come
+# from the vote counters and rows are read in chunks, so memory stays bounded
+# regardless of poll size or number of answers. Unlike the other poll pages it is
+# not cached with cache_poll_page: caching would hold the whole document in memory
+# and the cache middleware skips streaming responses anyway, so every request
+# reads the current counts.
+@method_decorator(replica_reads, name="dispatch")
+class PollDetailView(APIView):
+    chunk_size = 2000
+
+    def get(self, request, pk):
+        poll = (
+            Poll.objects.filter(pk=pk).values("id", "poll_name", "created_at").first()
+        )
+        if poll is None:
+            raise Http404("No Poll matches the given query.")
+
+        return StreamingHttpResponse(self.stream(poll), content_type="application/json")
+
+    def stream(self, poll):
+        date_field = serializers.DateTimeField()
+        poll["created_at"] = date_field.to_representation(poll["created_at"])
+        head = json.dumps({**poll, "questions": []}, separators=(",", ":"))
+        yield head[:-2]
+
+        choices = self.poll_choices(poll["id"])
+        choice = next(choices, None)
+        questions = (
+            Question.objects.filter(poll_id=poll["id"])
+            .order_by("id")
+            .values_list("id", "question_text", "pub_date")
+            .iterator(chunk_size=self.chunk_size)
+        )
+        for index, (question_id, question_text, pub_date) in enumerate(questions):
+            question_choices = []
+            while choice is not None and choice[0] == question_id:
+                question_choices.append(
+                    {
+                        "id": choice[1],
+                        "choice_text": choice[2],
+                        "num_answers": choice[3],
+                    }
                 )
-        else:
+                choice = next(choices, None)
+
+            question = {
+                "id": question_id,
+                "question_text": question_text,
+                "pub_date": date_field.to_representation(pub_date),
+                "choices": question_choices,
+            }
+            yield ("," if index else "") + json.dumps(question, separators=(",", ":"))
+        yield "]}"
+
+    def poll_choices(self, poll_id):
+        return (
+            annotate_vote_totals(Choice.objects.filter(question__poll_id=poll_id))
+            .order_by("question_id", "id")
+            .values_list("question_id", "id", "choice_text", "total_votes")
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+
+# Api view returning answer counts of a poll's choices over time, read from rollups.
+class PollTimeSeriesView(APIView):
+    bucket_sizes = {
+        "minute": datetime.timedelta(minutes=1),
+        "hour": datetime.timedelta(hours=1),
+        "day": datetime.timedelta(days=1),
+    }
+    default_buckets = {"minute": 60, "hour": 24 * 7, "day": 365}
+    max_buckets = 10000
+
+    def get(self, request, pk):
+        poll = get_object_or_404(Poll, pk=pk)
+        granularity = request.query_params.get("granularity", "hour")
+        if granularity not in self.bucket_sizes:
             return Response(
-                {"error": "No valid votes submitted"},
+                {"error": f"Granularity must be one of {', '.join(self.bucket_sizes)}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        try:
+            end = self.parse_time(request.query_params.get("end")) or timezone.now()
+            start = self.parse_time(request.query_params.get("start")) or (
+                end - self.bucket_sizes[granularity] * self.default_buckets[granularity]
+            )
+        except ValueError:
+            return Response(
+                {"error": "Invalid start or end time"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not start < end <= start + self.bucket_sizes[granularity] * self.max_buckets:
+            return Response(
+                {"error": f"Range must cover 1 to {self.max_buckets} {granularity}s"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rollups = AnswerRollup.objects.filter(
+            choice__question__poll=poll,
+            granularity=granularity,
+            bucket__gte=start,
+            bucket__lt=end,
+        ).order_by("bucket", "choice_id")
+        return Response(
+            {
+                "poll": poll.id,
+                "granularity": granularity,
+                "start": start,
+                "end": end,
+                "series": AnswerRollupSerializer(rollups, many=True).data,
+            }
+        )
+
+    def parse_time(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(value)
+        # Times are compared and stored in the project's time zone mode.
+        if settings.USE_TZ and timezone.is_naive(parsed):
+            return timezone.make_aware(parsed)
+        if not settings.USE_TZ and timezone.is_aware(parsed):
+            return timezone.make_naive(parsed)
+        return parsed
+
+
+async def poll_tallies(poll_id):
+    choices = annotate_vote_totals(Choice.objects.filter(question__poll_id=poll_id))
+    return {
+        choice_id: total_votes
+        async for choice_id, total_votes in choices.values_list("id", "total_votes")
+    }
+
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+tally_broadcaster = TallyBroadcaster(poll_updates, poll_tallies)
+
+
+# Sending a full snapshot of choice tallies first, then only changed tallies
+# whenever the poll gets votes, at most once per POLLS_STREAM_INTERVAL seconds.
+# Tallies are read once per poll for all its viewers, see TallyBroadcaster.
+async def tally_events(poll_id):
+    async with tally_broadcaster.listen(poll_id) as listener:
+        yield server_sent_event("snapshot", listener.tallies)
+        while True:
+            try:
+                changes = await asyncio.wait_for(
+                    listener.next_changes(), timeout=settings.POLLS_STREAM_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield server_sent_event("tally", changes)
+
+
+# Async view streaming live results of a poll as server-sent events.
+async def poll_stream(request, pk):
+    if not await Poll.objects.filter(pk=pk).aexists():
+        raise Http404("No Poll matches the given query.")
+
+    return StreamingHttpResponse(
+        tally_events(pk),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
-# api view for geting statistic data
-class PollDetailView(RetrieveAPIView):
-    queryset = Poll.objects.prefetch_related("questions__choices__answers")
-    serializer_class = PollDetailSerializer
+# Api view exposing this process' page cache statistics.
+class CacheStatsView(APIView):
+    def get(self, request):
+        return Response(cache_stats())
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
 
-        return Response(serializer.data)
+# Prometheus endpoint with request metrics of this process.
+def metrics(request):
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4")
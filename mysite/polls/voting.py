@@ -0,0 +1,83 @@
+from django.db import connections, router, transaction
+
+from polls.caching import invalidate_polls
+from polls.counters import increment_votes
+from polls.models import (
+    Answer,
+    AnswerRollup,
+    ArchivedAnswer,
+    Ballot,
+    Choice,
+    VoteCounterShard,
+)
+from polls.pubsub import poll_updates
+
+
+# Saving many (poll_id, choice_ids) ballots with their answers and counting them
+# in one transaction. bulk_create skips the Answer signals, so counters, cache and
+# live viewers are handled here, the last two once the transaction commits.
+def record_ballots(ballots):
+    poll_ids = {poll_id for poll_id, _ in ballots}
+    choice_ids = [choice_id for _, ids in ballots for choice_id in ids]
+
+    # Pages are only expired once the votes are visible, a page rendered before
+    # the commit would otherwise be cached under the new version.
+    def committed():
+        invalidate_polls(*poll_ids)
+        for poll_id in poll_ids:
+            poll_updates.publish(poll_id)
+
+    with transaction.atomic():
+        saved = Ballot.objects.bulk_create(
+            [Ballot(poll_id=poll_id) for poll_id, _ in ballots]
+        )
+        answers = Answer.objects.bulk_create(
+            [
+                Answer(choice_id=choice_id, ballot_id=ballot.id)
+                for ballot, (_, ids) in zip(saved, ballots)
+                for choice_id in ids
+            ]
+        )
+        increment_votes(choice_ids)
+        transaction.on_commit(committed)
+    return answers
+
+
+def record_answers(poll_id, choice_ids):
+    return record_ballots([(poll_id, choice_ids)])
+
+
+# Deleting the rows of a queryset with one DELETE statement, without fetching them
+# or sending delete signals. Rows referencing them are left alone. Returns the
+# number of deleted rows.
+def delete_rows(queryset):
+    model = queryset.model
+    db = router.db_for_write(model)
+    connection = connections[db]
+    sql, params = queryset.order_by().values("pk").query.get_compiler(db).as_sql()
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({sql})", params)
+        return cursor.rowcount
+
+
+# Removing every answer of given polls and zeroing their tallies with one statement
+# per table, instead of deleting answers one by one through their signals. Returns
+# the number of deleted live answers.
+def reset_answers(poll_ids):
+    choices = Choice.objects.filter(question__poll_id__in=poll_ids)
+
+    def publish():
+        for poll_id in poll_ids:
+            poll_updates.publish(poll_id)
+
+    with transaction.atomic():
+        deleted = delete_rows(Answer.objects.filter(choice__in=choices))
+        for model in (ArchivedAnswer, AnswerRollup, VoteCounterShard):
+            model.objects.filter(choice__in=choices).delete()
+        delete_rows(Ballot.objects.filter(poll_id__in=poll_ids))
+        choices.update(vote_count=0)
+        transaction.on_commit(publish)
+    invalidate_polls(*poll_ids)
+    return deleted
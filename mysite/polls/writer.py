@@ -0,0 +1,121 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection
+
+from polls.voting import record_ballots
+
+logger = logging.getLogger(__name__)
+
+
+# Background thread saving queued ballots with one bulk insert per batch. A batch
+# is flushed once it holds "batch_size" answers or is "flush_ms" milliseconds old.
+class AnswerWriter:
+    def __init__(self, queue_size, batch_size, flush_ms, retries=3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="polls-answer-writer", daemon=True
+                )
+                self._thread.start()
+
+    # Queueing a ballot, raises queue.Full when the writer can't keep up.
+    def submit(self, poll_id, choice_ids):
+        self.start()
+        self._queue.put_nowait((poll_id, choice_ids))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    # Flushing everything still queued and stopping the thread.
+    def stop(self, timeout=None):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            thread.join(timeout)
+
+    def _run(self):
+        try:
+            while not (self._stopping.is_set() and self._queue.empty()):
+                batch = self._collect()
+                if batch:
+                    self._flush(batch)
+        finally:
+            connection.close()
+            # A thread ended by an unexpected error is started again by submit().
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _collect(self):
+        batch = []
+        rows = 0
+        deadline = time.monotonic() + self.flush_interval
+        while rows < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if self._stopping.is_set():
+                    ballot = self._queue.get_nowait()
+                elif timeout > 0:
+                    # Waking up regularly to notice stop() during a long interval.
+                    ballot = self._queue.get(timeout=min(timeout, 0.1))
+                else:
+                    break
+            except queue.Empty:
+                if self._stopping.is_set() or timeout <= 0:
+                    break
+                continue
+            batch.append(ballot)
+            rows += len(ballot[1])
+        return batch
+
+    # Retrying transient errors, and saving ballots one by one when a batch keeps
+    # failing so that one bad ballot (e.g. of a deleted choice or a malformed
+    # payload) doesn't drop the rest or stop the thread.
+    def _flush(self, batch):
+        for attempt in range(1, self.retries + 1):
+            try:
+                record_ballots(batch)
+                return
+            except IntegrityError:
+                logger.exception("Saving %d ballots failed", len(batch))
+                break
+            except DatabaseError:
+                logger.exception(
+                    "Saving %d ballots failed (attempt %d)", len(batch), attempt
+                )
+                time.sleep(self.flush_interval * attempt)
+            except Exception:
+                logger.exception("Saving %d ballots failed", len(batch))
+                break
+
+        if len(batch) > 1:
+            for ballot in batch:
+                self._flush([ballot])
+        else:
+            logger.error("Dropped ballot for poll %s", batch[0][0])
+
+
+answer_writer = AnswerWriter(
+    queue_size=settings.POLLS_WRITER_QUEUE_SIZE,
+    batch_size=settings.POLLS_WRITER_BATCH_SIZE,
+    flush_ms=settings.POLLS_WRITER_FLUSH_MS,
+)
+
+# Draining queued ballots when the worker process exits.
+atexit.register(answer_writer.stop)